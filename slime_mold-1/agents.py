@@ -1,14 +1,23 @@
+from chem_field import compute_chem_field
 from helpers import get_distance
 from mesa import Agent
 import numpy as np
-import random
+
+# Flags of the occupancy index of the model, a cell can contain several agent types at once
+EMPTY = 0
+SLIME = 1
+FOOD = 2
 
 
 class FoodAgent(Agent):
     """Agent type that is responsible for setting up the chemical environment in the model."""
+    occupancy_flag = FOOD
+
     def __init__(self, unique_id, model, position):
         """
-        Initialize food agents
+        Initialize food agents.
+        The chemical environment of all food agents is built at once by the model, call update_chem to add the
+        attraction of a food agent that is placed afterwards.
 
         Args:
             unique_id: unique id of the agent (int).
@@ -19,19 +28,17 @@ class FoodAgent(Agent):
 
         self.pos = position
 
-        self.update_chem()
-
     def update_chem(self):
         """Function that updates the chemical environment to create force of attraction towards itself."""
-        for _, x, y in self.model.grid.coord_iter():
-            x_y_dist = np.abs(np.subtract((x, y), self.pos))
-            dist = np.sqrt(np.sum(x_y_dist**2))
-
-            self.model.chem_values[x, y] += self.model.signal_strength / ((dist + 1)**2)
+        # Chemical fields can be shared read-only between models, so replace the field instead of updating it in place
+        field = compute_chem_field(self.model.width, self.model.height, [self.pos], self.model.signal_strength)
+        self.model.chem_values = self.model.chem_values + field
 
 
 class SlimeAgent(Agent):
     """Agent type that is responsible for formation of networks in the model."""
+    occupancy_flag = SLIME
+
     def __init__(self, unique_id, model, parent_location, origin=False):
         """
         Initialize slime agents.
@@ -60,7 +67,12 @@ class SlimeAgent(Agent):
 
         self.model.connections[coordinate] = ({(self.pos, cost)})
         self.model.connections[self.pos].add((coordinate, cost))
+
+        if self.model.growth_log is not None:
+            self.model.growth_log += (*self.pos, *coordinate, cost)
+
         self.model.grid.place_agent(new_slime, coordinate)
+        self.model.occupancy[coordinate] |= SLIME
         self.model.schedule.add(new_slime)
 
     def connect(self, coordinate):
@@ -76,6 +88,9 @@ class SlimeAgent(Agent):
         self.model.connections[self.pos].add((coordinate, cost))
         self.model.connections[coordinate].add((self.pos, cost))
 
+        if self.model.growth_log is not None:
+            self.model.growth_log += (*self.pos, *coordinate, cost)
+
     def step(self):
         """
         Function that advances a slime agent one step.
@@ -91,18 +106,26 @@ class SlimeAgent(Agent):
         empty_cells, occupied_cells = self.model.divide_neighborhood(neighborhood, SlimeAgent)
         n = len(empty_cells)
 
+        # Random numbers for this agent, drawn by the model for all agents of this step at once. An agent (or schedule)
+        # that is stepped outside of SlimeModel.step draws its own numbers.
+        draws = next(self.model.step_draws, None)
+
+        if draws is None:
+            draws = self.model.draw_agent_random_numbers()
+
+        branch_draw, connect_draw, choice_draw, noise = draws
+
         # Go through multiplying steps if there are slime-free grid cells in the neighborhood
         if n != 0:
             # Determine if branching off takes place
             if self.origin:
                 n_branches = 4
-            elif np.random.uniform() < self.model.p_branch and n > 1:
+            elif branch_draw < self.model.p_branch and n > 1:
                 n_branches = 2
             else:
                 n_branches = 1
 
             # Apply noise to attraction by neighbouring empty grid cells
-            noise = np.random.normal(0, self.model.noise, size=n)
             order = []
 
             for i, coordinate in enumerate(empty_cells):
@@ -118,10 +141,10 @@ class SlimeAgent(Agent):
                 self.multiply(new_position)
 
         # Go through connecting steps if there are slime-occupied grid cells in the nighborhood
-        if len(occupied_cells) > 0 and np.random.uniform() < self.model.p_connect:
+        if len(occupied_cells) > 0 and connect_draw < self.model.p_connect:
 
             # Pick random neighbouring slime agent (location) and update connections
-            coordinate = random.sample(occupied_cells, 1)[0]
+            coordinate = occupied_cells[int(choice_draw * len(occupied_cells))]
             self.connect(coordinate)
 
         # Each slime agent goes through one cycle of multiplying/connecting
@@ -1,14 +1,30 @@
-import sys
-import networkx as nx
-import matplotlib.pyplot as plt
+import argparse
+import heapq
+import math
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from functools import partial
 import pickle
 
 from agents import *
 from model import *
 from helpers import *
+from csr_graph import CSRGraph
+from result_store import MAGIC, ResultStore
+from network_image import save_network_image
 from read_geo_data import get_city_grid
 
 
+# Edge costs are rounded to three decimals, so a diagonal step costs 1.414 while its straight-line distance is
+# sqrt(2). Scaling the straight-line distance by their ratio keeps the A* heuristic admissible.
+HEURISTIC_SCALE = 1.414 / np.sqrt(2) * (1 - 1e-9)
+
+CITIES = ["berlin", "dublin", "helsinki", "lisbon", "luxembourg", "paris", "rome"]
+BETWEENNESS_MODES = ["exact", "sampled"]
+
+
+# Results of older experiments were pickled as this object, it is kept so load_data can read them
 class ExperimentResults:
     def __init__(self, _x_vals, _results, _n_runs):
         self.x_vals = _x_vals
@@ -28,6 +44,8 @@ def convert_result_to_graph(connections):
     Returns:
         networkx.Graph: the network containing all nodes and edges
     """
+    import networkx as nx
+
     graph = nx.Graph()
 
     graph.add_nodes_from(connections.keys())
@@ -41,85 +59,338 @@ def convert_result_to_graph(connections):
     return graph
 
 
-def get_all_shortest_paths(connections, target_nodes):
-    """Finds all shortest paths between the specified nodes
+def single_source_dijkstra(connections, source, targets=None):
+    """Finds the shortest path tree from a source node with Dijkstra's algorithm
+
+    Args:
+        connections: dictionary result from the model
+        source: node to start from
+        targets: optional set of nodes, the search stops once all of them are reached
 
     Returns:
-        dict[frozenset(list)]: dictionary containing all discovered shortest paths (use frozenset with the start and end node as key)
+        dict, dict: distance and predecessor on the shortest path of the reached nodes, which are final for all
+            targets (or all nodes if no targets are given)
     """
-    graph = convert_result_to_graph(connections)
-    shortest_paths = {}
+    dist = {source: 0}
+    pred = {source: None}
+    remaining = set(targets) - {source} if targets is not None else None
+    settled = set()
+    heap = [(0, 0, source)]
+    count = 1
+
+    while heap:
+        d, _, node = heapq.heappop(heap)
+
+        if node in settled:
+            continue
+
+        settled.add(node)
+
+        if remaining is not None:
+            remaining.discard(node)
+
+            if not remaining:
+                break
+
+        for next_node, cost in connections[node]:
+            new_d = d + cost
+
+            if next_node not in settled and new_d < dist.get(next_node, np.inf):
+                dist[next_node] = new_d
+                pred[next_node] = node
+                heapq.heappush(heap, (new_d, count, next_node))
+                count += 1
+
+    return dist, pred
+
+
+def get_path(pred, target):
+    """Follows the predecessors from target back to the source and returns the path from source to target"""
+    path = [target]
+
+    while pred[path[-1]] is not None:
+        path.append(pred[path[-1]])
+
+    return path[::-1]
+
+
+def astar(connections, source, target):
+    """Finds the shortest path between two nodes with A* and a straight-line heuristic
+
+    Edge costs are Euclidean distances rounded to three decimals, so the straight-line distance is scaled down by
+    HEURISTIC_SCALE to never overestimate the remaining cost.
+
+    Returns:
+        dict, dict: distance and predecessor of the reached nodes, the search stops once target is settled
+    """
+    x_t, y_t = target
+    dist = {source: 0}
+    pred = {source: None}
+    settled = set()
+    heap = [(0, 0, source)]
+    count = 1
+
+    while heap:
+        _, _, node = heapq.heappop(heap)
+
+        if node in settled:
+            continue
+
+        settled.add(node)
+
+        if node == target:
+            break
+
+        d = dist[node]
+
+        for next_node, cost in connections[node]:
+            new_d = d + cost
+
+            if next_node not in settled and new_d < dist.get(next_node, np.inf):
+                dist[next_node] = new_d
+                pred[next_node] = node
+                x, y = next_node
+                heapq.heappush(heap, (new_d + HEURISTIC_SCALE * math.hypot(x - x_t, y - y_t), count, next_node))
+                count += 1
+
+    return dist, pred
+
+
+def find_pair_searches(connections, target_nodes, method):
+    """Runs the searches for all pairs of target nodes with the given method ("dijkstra" or "astar")
+
+    Yields:
+        node_a, node_b, dist, pred: for every pair of target nodes in the graph, with the distances and
+        predecessors of the search that covers the pair
+    """
+    if method not in ("dijkstra", "astar"):
+        raise ValueError(f"Unknown shortest path method: {method}")
 
     for i in range(len(target_nodes)):
-        for j in range(i, len(target_nodes)):
-            if i != j:
-                node_a = target_nodes[i]
-                node_b = target_nodes[j]
+        node_a = target_nodes[i]
 
-                if node_a in graph.nodes and node_b in graph.nodes:
-                    try:
-                        shortest_paths[frozenset([node_a, node_b])] = nx.algorithms.astar_path(graph, node_a, node_b)
-                    except nx.exception.NetworkXNoPath:
-                        shortest_paths[frozenset([node_a, node_b])] = None
+        if node_a not in connections:
+            continue
+
+        later_nodes = [node for node in target_nodes[i + 1:] if node in connections]
+
+        if method == "dijkstra":
+            dist, pred = single_source_dijkstra(connections, node_a, later_nodes)
+
+            for node_b in later_nodes:
+                yield node_a, node_b, dist, pred
+        else:
+            for node_b in later_nodes:
+                dist, pred = astar(connections, node_a, node_b)
+
+                yield node_a, node_b, dist, pred
+
+
+def get_all_shortest_paths(connections, target_nodes, method="dijkstra", return_paths=True):
+    """Finds all shortest paths between the specified nodes
+    With the "dijkstra" method a single search is run per target node, which stops once all later target nodes have
+    been reached, and the paths are extracted from its predecessors. The "astar" method runs a separate A* search
+    with a straight-line heuristic per pair. With return_paths=False only the lengths are returned, for metrics that
+    never look at the paths, so no path is built.
+
+    Returns:
+        dict[frozenset(list)]: dictionary containing all discovered shortest paths (use frozenset with the start and
+            end node as key), or the length of every path if return_paths is False (None if there is no path)
+    """
+    shortest_paths = {}
+
+    for node_a, node_b, dist, pred in find_pair_searches(connections, target_nodes, method):
+        if return_paths:
+            shortest_paths[frozenset([node_a, node_b])] = get_path(pred, node_b) if node_b in pred else None
+        else:
+            shortest_paths[frozenset([node_a, node_b])] = dist.get(node_b)
 
     return shortest_paths
 
 
-def get_average_shortest_path_length(graph, use_weights=True):
-    all_lengths = []
+def map_source_chunks(function, sources, workers=1):
+    """Applies a function to the source nodes, split in chunks over a pool of processes if workers > 1.
+
+    Args:
+        function: function that takes an array of source node indices and returns an array with one column
+                  (last axis) per source
+        sources: NumPy array of source node indices
+        workers: amount of processes
+
+    Returns:
+        NumPy array with the results of all chunks concatenated along the last axis
+    """
+    if workers > 1 and len(sources) > workers:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            return np.concatenate(list(executor.map(function, np.array_split(sources, workers))), axis=-1)
+
+    return function(sources)
+
+
+def get_average_shortest_path_length(graph, use_weights=True, food_nodes=None, workers=1):
+    """Computes the average shortest path length of every connected component
+    and returns the mean over the components. A component of a single node has an average of 0.
+
+    Args:
+        graph: CSRGraph of the network
+        use_weights: use the edge costs as lengths instead of counting the edges
+        food_nodes: optional list of (x, y) coordinates of the food sources, only the paths between food
+                    sources are averaged if given (over the components that contain food)
+        workers: amount of processes to split the source nodes over
+
+    Returns:
+        float: average shortest path length
+    """
+    n_components, labels = graph.connected_components()
+
+    if food_nodes is None:
+        sources, targets = np.arange(graph.n_nodes), None
+    else:
+        sources = targets = np.unique(graph.get_indices(food_nodes))
+
+    sums, counts = map_source_chunks(partial(graph.path_length_sums, targets=targets, weighted=use_weights),
+                                     sources, workers)
 
-    for C in [graph.subgraph(c).copy() for c in nx.connected_components(graph)]:
-        all_lengths.append(nx.average_shortest_path_length(C, weight='weight' if use_weights else None))
+    component_sums = np.bincount(labels[sources], weights=sums, minlength=n_components)
+    component_pairs = np.bincount(labels[sources], weights=counts, minlength=n_components)
+    averages = np.divide(component_sums, component_pairs, out=np.zeros(n_components), where=component_pairs > 0)
 
-    return np.mean(all_lengths)
+    return np.mean(averages[np.bincount(labels[sources], minlength=n_components) > 0])
 
 
 def get_average_node_degree(graph, target_nodes=None):
-    return np.mean([d for (_, d) in graph.degree(target_nodes)])
+    return np.mean(graph.degree(target_nodes))
+
+
+def get_average_betweenness(graph, mode="exact", pivots=100, workers=1, seed=None):
+    """Computes the mean normalized betweenness centrality of all nodes (on unweighted shortest paths,
+    like networkx.betweenness_centrality).
+
+    Args:
+        graph: CSRGraph of the network
+        mode: "exact" to use every node as source, "sampled" to estimate it from a random sample of pivots
+        pivots: amount of source nodes to sample in the sampled mode
+        workers: amount of processes to split the source nodes over in the exact mode
+        seed: seed used to pick the pivots
+
+    Returns:
+        float: average betweenness centrality
+    """
+    if mode == "exact":
+        return get_exact_average_betweenness(graph, workers)
+    elif mode == "sampled":
+        return estimate_average_betweenness(graph, pivots, seed)[0]
+
+    raise ValueError(f"unknown betweenness mode {mode}, choose from {BETWEENNESS_MODES}")
 
 
-def get_average_betweenness(graph):
-    return np.mean(list(nx.betweenness_centrality(graph).values()))
+def get_betweenness_scale(n):
+    """Returns the factor that turns the summed dependencies of all sources into the mean betweenness of n nodes."""
+    return 1 / (n * (n - 1) * (n - 2)) if n > 2 else 0
 
 
-def remove_unused_nodes(graph, active_nodes: set):
-    """Basically reduce the graph further by removing nodes that are not
-    in main_nodes and only connecting the main nodes with each other using shortest paths.
+def get_exact_average_betweenness(graph, workers=1):
+    """Computes the mean betweenness centrality from the dependencies of all source nodes.
+    With workers > 1 the source nodes are split over a pool of processes.
+    """
+    total = map_source_chunks(graph.dependency_totals, np.arange(graph.n_nodes), workers).sum()
+
+    return total * get_betweenness_scale(graph.n_nodes)
+
+
+def estimate_average_betweenness(graph, pivots=100, seed=None):
+    """Estimates the mean betweenness centrality from the dependencies of a random sample of source nodes.
+
+    Args:
+        graph: CSRGraph of the network
+        pivots: amount of source nodes to sample without replacement, the result is exact if this covers all nodes
+        seed: seed used to pick the pivots
+
+    Returns:
+        float: estimated average betweenness centrality
+        float: half width of the 95% confidence interval of the estimate
+    """
+    n = graph.n_nodes
+
+    if pivots >= n:
+        return get_exact_average_betweenness(graph), 0.0
 
-    returns a Graph
+    sources = np.random.default_rng(seed).choice(n, size=pivots, replace=False)
+    totals = graph.dependency_totals(sources)
+
+    # Standard error of the sample mean with the finite population correction
+    error = np.std(totals, ddof=1) / np.sqrt(pivots) * np.sqrt((n - pivots) / (n - 1)) if pivots > 1 else np.inf
+    scale = n * get_betweenness_scale(n)
+
+    return np.mean(totals) * scale, 1.96 * error * scale
+
+
+def extract_backbone(graph, food_nodes, use_weights=True):
+    """Reduces the network to the edges on the shortest paths between the food sources (the backbone),
+    and builds the metric closure of the food sources, both from one shortest path tree per food source.
+
+    Args:
+        graph: CSRGraph of the network
+        food_nodes: list of (x, y) coordinates of the food sources
+        use_weights: use the edge costs as lengths instead of counting the edges
+
+    Returns:
+        CSRGraph: subgraph with only the edges that are used by a shortest path between two food sources
+        CSRGraph: complete graph of the connected food sources with their shortest path lengths as costs
     """
-    new_graph = nx.Graph()
+    food = np.unique(graph.get_indices(food_nodes))
+    dist, pred = graph.shortest_path_lengths(food, weighted=use_weights, return_predecessors=True)
+    edges = [np.empty((0, 2), dtype=np.int64)]
 
-    # Add nodes
-    for node in active_nodes:
-        new_graph.add_node(node)
+    # Walk every tree up from the food sources it reaches, each pair is only needed in one direction
+    for i in range(len(food)):
+        frontier = food[i + 1:][np.isfinite(dist[i, food[i + 1:]])]
+        visited = np.zeros(graph.n_nodes, dtype=bool)
+        visited[frontier] = True
 
-    # Add edges
-    node_list = list(active_nodes)
-    for i in range(len(node_list)):
-        for j in range(i, len(node_list)):
-            if i != j:
-                node_A = node_list[i]
-                node_B = node_list[j]
+        while len(frontier):
+            parents = pred[i, frontier]
+            has_parent = parents >= 0
+            edges.append(np.stack([parents[has_parent], frontier[has_parent]], axis=1))
 
-                if node_A in graph.nodes and node_B in graph.nodes:
-                    d = nx.shortest_path_length(graph, node_A, node_B)
+            frontier = np.unique(parents[has_parent])
+            frontier = frontier[~visited[frontier]]
+            visited[frontier] = True
 
-                    new_graph.add_edge(node_A, node_B, weight=d)
+    backbone = graph.edge_subgraph(np.unique(np.sort(np.concatenate(edges), axis=1), axis=0))
 
-    return new_graph
+    pairs = np.argwhere(np.triu(np.isfinite(dist[:, food]), k=1))
+    closure = CSRGraph.from_edges(graph.nodes[food], pairs, dist[pairs[:, 0], food[pairs[:, 1]]])
+
+    return backbone, closure
 
 
 def load_data(filename):
+    """Loads the results of an experiment from a result file (or a pickle file of an older experiment).
+    Simulations that have not finished yet are NaN in the results.
+
+    Returns:
+        x_vals, results of shape (N_runs, 3, len(x_vals)), N_runs
+    """
     with open(filename, "rb") as fp:
-        data_obj = pickle.load(fp)
+        if fp.read(len(MAGIC)) != MAGIC:
+            fp.seek(0)
+            data_obj = pickle.load(fp)
+
+            return data_obj.x_vals, data_obj.results, data_obj.n_runs
 
-        return data_obj.x_vals, data_obj.results, data_obj.n_runs
+    store = ResultStore(filename)
+    x_vals = np.array(store.metadata["x_vals"])
+    n_runs = store.metadata["n_runs"]
+
+    return x_vals, store.get_results(n_runs, len(x_vals)), n_runs
 
 
 def plot_data(x_vals, data, n_runs):
-    mean_data = np.mean(data, axis=0)
-    std_data = np.std(data, axis=0)
+    import matplotlib.pyplot as plt
+
+    mean_data = np.nanmean(data, axis=0)
+    std_data = np.nanstd(data, axis=0)
 
     output_vars = ['average shortest path length', 'average degree', 'average betweenness']
 
@@ -136,25 +407,27 @@ def plot_data(x_vals, data, n_runs):
         plt.savefig(output_vars[i] + ".png")
 
 
-def plot_node_distribution():
+def plot_node_distribution(seed=None):
     N_steps = 200
     size = 100
     p_branch = 0.075
     p_connect = 0.1
     signal_strength = 1
     noise = 0.05 * signal_strength
-    food_coords = text_to_coords("tokyo_coords.txt")
+    food_coords = text_to_coords(TOKYO_COORDS_FILE)
 
     degrees = []
-    for _ in range(50):
+    for run_seed in spawn_seeds(seed, 50):
         model = SlimeModel(size, size, p_branch, p_connect, signal_strength, noise,
-                            food_coords)
+                            food_coords, seed=run_seed)
 
         connections = model.run(N_steps)
         reduced_graph = reduce_graph(connections, food_coords)
-        nx_graph = convert_result_to_graph(reduced_graph)
+        graph = CSRGraph.from_connections(reduced_graph)
 
-        degrees += [d for (_, d) in nx_graph.degree(food_coords)]
+        degrees += graph.degree(food_coords).tolist()
+
+    import matplotlib.pyplot as plt
 
     plt.figure()
 
@@ -165,119 +438,299 @@ def plot_node_distribution():
     plt.show()
 
 
-def run_experiment(N_runs=1, omit_unused=False, save_file=None):
+def run_simulation(p_branch, p_connect, signal_strength, noise, food_coords, size, N_steps, omit_unused, seed,
+                   betweenness="exact", pivots=100, food_paths=False, network_file=None, image_file=None):
+    """Runs a single simulation and measures the resulting network.
+
+    Args:
+        p_branch, p_connect, signal_strength, noise: parameters of the model
+        food_coords: list of (x, y) coordinates of the food sources
+        size: width and height of the grid
+        N_steps: amount of steps to run the model
+        omit_unused: only keep the edges on shortest paths between food sources (the backbone, see extract_backbone)
+            and measure that subgraph. Results of older versions, which measured the complete graph of the
+            shortest path lengths between the used nodes instead, cannot be compared with these results.
+        seed: seed of the model
+        betweenness: mode of the betweenness centrality, "exact" or "sampled"
+        pivots: amount of source nodes to sample in the sampled betweenness mode
+        food_paths: only average the shortest path lengths between food sources
+        network_file: optional .npz file to store the (unreduced) network in
+        image_file: optional PNG file to draw the (unreduced) network in
+
+    Returns:
+        tuple(float): average shortest path length, average degree and average betweenness
+    """
+    model = SlimeModel(size, size, p_branch, p_connect, signal_strength, noise,
+                        food_coords, seed=seed)
+
+    connections = model.run(N_steps)
+
+    if network_file:
+        CSRGraph.from_connections(connections).save(network_file)
+
+    if image_file:
+        save_network_image(image_file, connections, food_coords, size, size)
+
+    return measure_network(connections, food_coords, omit_unused, seed, betweenness, pivots, food_paths)
+
+
+def measure_network(connections, food_coords, omit_unused=False, seed=None, betweenness="exact", pivots=100,
+                    food_paths=False):
+    """Reduces the network of a simulation and measures it. A network stored by run_simulation can be measured
+    again with measure_network(CSRGraph.load(network_file).to_connections(), food_coords).
+
+    Args:
+        connections: connections dictionary of the model
+        food_coords: list of (x, y) coordinates of the food sources
+        omit_unused, betweenness, pivots, food_paths: see run_simulation
+        seed: seed used to pick the pivots of the sampled betweenness
+
+    Returns:
+        tuple(float): average shortest path length, average degree and average betweenness
+    """
+    reduced_graph = reduce_graph(connections, food_coords)
+    graph = CSRGraph.from_connections(reduced_graph)
+
+    if omit_unused:
+        graph = extract_backbone(graph, food_coords)[0]
+
+    # Find the average shortest path length, average degree and average betweenness centrality
+    return (get_average_shortest_path_length(graph, food_nodes=food_coords if food_paths else None),
+            get_average_node_degree(graph),
+            get_average_betweenness(graph, betweenness, pivots, seed=seed))
+
+
+def run_timed_simulation(*args):
+    """Runs a single simulation with run_simulation and also returns its duration in seconds."""
+    start = time.time()
+    metrics = run_simulation(*args)
+
+    return metrics, time.time() - start
+
+
+def get_job_seed(seed, run_i, i):
+    """Derives a deterministic seed for a single simulation from the seed of the experiment."""
+    return spawn_seeds(np.random.SeedSequence(seed, spawn_key=(run_i, i)), 1)[0]
+
+
+def run_experiment(N_runs=1, omit_unused=False, save_file=None, workers=1, seed=None, betweenness="exact", pivots=100,
+                   food_paths=False, network_dir=None, image_dir=None):
     """Vary parameters (except agent count)
 
     plot average degree, average path length, maybe other outputs
+
+    Every simulation gets its own seed derived from seed, so the results do not depend on the amount of workers.
+    With workers > 1 the simulations are spread over a pool of processes.
+    With betweenness="sampled" the betweenness centrality is estimated from pivots source nodes per network.
+    With food_paths the average shortest path length only covers the paths between food sources.
+    With omit_unused the networks are reduced to their backbone, the edges on the (weighted) shortest paths between
+    food sources, which is measured as is. Older versions measured the complete graph of the unweighted shortest path
+    lengths between the used nodes (with a degree of U - 1 and a betweenness of 0), so their results differ.
+
+    With a save_file every simulation is appended to a result file as soon as it finishes.
+    If the file already exists, the experiment is resumed and only the unfinished simulations are run.
+    With a network_dir the network of every simulation is stored in it as run<run>_<index>.npz.
+    With an image_dir an image of every network is stored in it as run<run>_<index>.png.
     """
     N_steps = 200
     size = 100
     resolution = 20
     p_branch_vals = np.linspace(0.0, 1.0, resolution)
-    p_branch = 0.075
     p_connect = 0.1
     signal_strength = 1
     noise = 0.05 * signal_strength
-    food_coords = get_city_grid("rome", size, size)
+    city = "rome"
+    food_coords = get_city_grid(city, size, size)
 
-    all_data = np.zeros((N_runs, 3, resolution))
+    # A resumed experiment continues with the seed it was started with
+    if seed is None and save_file and os.path.exists(save_file):
+        seed = ResultStore(save_file).metadata["seed"]
+    elif seed is None:
+        seed = np.random.SeedSequence().entropy
 
-    print(f"Estimated time: ~{N_runs * resolution * 10} second(s)")
+    all_data = np.zeros((N_runs, 3, resolution))
+    store = None
+    completed = set()
 
+    if save_file:
+        metadata = {"x_vals": p_branch_vals.tolist(), "n_runs": N_runs, "seed": seed, "city": city, "size": size,
+                    "N_steps": N_steps, "p_connect": p_connect, "signal_strength": signal_strength, "noise": noise,
+                    "omit_unused": omit_unused, "betweenness": betweenness, "pivots": pivots,
+                    "food_paths": food_paths}
+        store = ResultStore.open_or_create(save_file, metadata)
+        completed = store.completed()
+        all_data = store.get_results(N_runs, resolution)
+
+        if completed:
+            print(f"resuming {save_file}: {len(completed)} simulations already finished")
+
+    for directory in (network_dir, image_dir):
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    jobs = {}
     for run_i in range(N_runs):
-        average_length = np.zeros(resolution)
-        average_degree = np.zeros_like(average_length)
-        average_betweenness = np.zeros_like(average_length)
-
-        print("Run", run_i + 1)
-
         for i in range(resolution):
-            p_branch = p_branch_vals[i]
+            if (run_i, i) not in completed:
+                jobs[(run_i, i)] = (p_branch_vals[i], p_connect, signal_strength, noise, food_coords, size, N_steps,
+                                    omit_unused, get_job_seed(seed, run_i, i), betweenness, pivots,
+                                    food_paths,
+                                    network_dir and os.path.join(network_dir, f"run{run_i}_{i}.npz"),
+                                    image_dir and os.path.join(image_dir, f"run{run_i}_{i}.png"))
+
+    def finish(key, metrics, duration):
+        """Store the metrics of a finished simulation."""
+        run_i, i = key
+        all_data[run_i, :, i] = metrics
+
+        if store is not None:
+            job = jobs[key]
+            store.append(run=run_i, index=i, p_branch=job[0], p_connect=job[1], signal_strength=job[2],
+                         noise=job[3], seed=job[8], path_length=metrics[0], degree=metrics[1],
+                         betweenness=metrics[2], duration=duration)
+
+    start = time.time()
+
+    def report(n_done):
+        """Display progress and the estimated remaining time."""
+        elapsed = time.time() - start
+        remaining = elapsed / n_done * (len(jobs) - n_done)
+        print(f"{100 * n_done / len(jobs):.2f}% ({n_done}/{len(jobs)}) elapsed: {elapsed:.0f}s ETA: {remaining:.0f}s")
+
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = {executor.submit(run_timed_simulation, *jobs[key]): key for key in jobs}
+
+            for n_done, future in enumerate(as_completed(futures), 1):
+                finish(futures[future], *future.result())
+                report(n_done)
+    else:
+        for n_done, key in enumerate(jobs, 1):
+            finish(key, *run_timed_simulation(*jobs[key]))
+            report(n_done)
 
-            # Display progress
-            print(f"{100 * i / resolution:.2f}% {p_branch:.4f}")
+    print()
 
-            model = SlimeModel(size, size, p_branch, p_connect, signal_strength, noise,
-                                food_coords)
+    return p_branch_vals, all_data
 
-            connections = model.run(N_steps)
-            reduced_graph = reduce_graph(connections, food_coords)
-            nx_graph = convert_result_to_graph(reduced_graph)
 
-            if omit_unused:
-                used_nodes = set()
-                for index_A in range(len(food_coords)):
-                    for index_B in range(i, len(food_coords)):
-                        if index_A != index_B:
-                            node_A = food_coords[index_A]
-                            node_B = food_coords[index_B]
+def benchmark_shortest_paths(cities=CITIES, size=100, N_steps=200, seed=0, legacy=True):
+    """Compares the shortest path methods on a simulated network of every city
 
-                            if node_A in nx_graph.nodes and node_B in nx_graph.nodes:
-                                used_nodes |= set(nx.shortest_path(nx_graph, node_A, node_B))
+    The legacy method is the former implementation that runs networkx A* without heuristic for every pair.
+    All methods are checked to find the same path lengths.
 
-                nx_graph = remove_unused_nodes(nx_graph, used_nodes)
+    Returns:
+        dict: per city a dictionary with the run time in seconds of every method
+    """
+    def legacy_lengths(connections, target_nodes):
+        import networkx as nx
 
-            # Find the average shortest path length
-            average_length[i] = get_average_shortest_path_length(nx_graph)
+        graph = convert_result_to_graph(connections)
+        lengths = {}
 
-            # Find the average degree
-            average_degree[i] = get_average_node_degree(nx_graph)
+        for i in range(len(target_nodes)):
+            for j in range(i + 1, len(target_nodes)):
+                node_a = target_nodes[i]
+                node_b = target_nodes[j]
 
-            # Find the average betweenness centrality
-            average_betweenness[i] = get_average_betweenness(nx_graph)
+                if node_a in graph.nodes and node_b in graph.nodes:
+                    try:
+                        lengths[frozenset([node_a, node_b])] = nx.astar_path_length(graph, node_a, node_b)
+                    except nx.exception.NetworkXNoPath:
+                        lengths[frozenset([node_a, node_b])] = None
 
-        # Save data in numpy array
-        all_data[run_i, 0] = average_length
-        all_data[run_i, 1] = average_degree
-        all_data[run_i, 2] = average_betweenness
+        return lengths
 
-    print("100.0%\n")
+    methods = {
+        "dijkstra paths": lambda c, t: get_all_shortest_paths(c, t, "dijkstra"),
+        "astar paths": lambda c, t: get_all_shortest_paths(c, t, "astar"),
+        "dijkstra lengths": lambda c, t: get_all_shortest_paths(c, t, "dijkstra", return_paths=False),
+        "astar lengths": lambda c, t: get_all_shortest_paths(c, t, "astar", return_paths=False),
+    }
 
-    # Save the data in a different object to be pickled
-    if save_file:
-        data_obj = ExperimentResults(p_branch_vals, all_data, N_runs)
+    if legacy:
+        methods["legacy"] = legacy_lengths
 
-        with open(save_file, "wb") as fp:
-            pickle.dump(data_obj, fp)
+    results = {}
 
-    return p_branch_vals, all_data
+    for city in cities:
+        food_coords = get_city_grid(city, size, size)
+        model = SlimeModel(size, size, food_coords=food_coords, seed=seed)
+        connections = reduce_graph(model.run(N_steps), food_coords)
 
+        results[city] = {}
+        reference = None
 
-if __name__ == "__main__":
-    """Options to run:
-    python analyze_data.py run <name of file to store experiment in>
-    python analyze_data.py plot <name of file that contains experiment to plot>
-    python analyze_data.py node_hist
-        This creates a histogram with node degrees in the graph.
-    """
-    N_runs = 5
+        for name, method in methods.items():
+            start = time.time()
+            output = method(connections, food_coords)
+            results[city][name] = time.time() - start
 
-    if len(sys.argv) > 1:
-        command = sys.argv[1]
+            # Compare path lengths with the first method
+            lengths = {key: (sum(dict(connections[a])[b] for a, b in zip(path, path[1:])) if isinstance(path, list)
+                             else path) for key, path in output.items()}
 
-        # Plot the data from the specified file
-        if command == 'plot':
-            filename = None
+            if reference is None:
+                reference = lengths
+            elif lengths.keys() != reference.keys() or any(
+                    (lengths[key] is None) != (reference[key] is None) or
+                    (lengths[key] is not None and not np.isclose(lengths[key], reference[key]))
+                    for key in reference):
+                raise AssertionError(f"{name} finds different path lengths for {city}")
 
-            if len(sys.argv) > 2:
-                filename = sys.argv[2]
+        print(f"{city} ({len(connections)} nodes, {len(reference)} pairs): " +
+              ", ".join(f"{name} {t:.3f}s" for name, t in results[city].items()))
 
-                x_vals, results, N_runs = load_data(filename)
-                plot_data(x_vals, results, N_runs)
-            else:
-                print("please provide file to load and plot")
-        # Run the data with the current parameters and save it in the specified file
-        elif command == 'run':
-            save_file = None
+    return results
 
-            if len(sys.argv) > 2:
-                save_file = sys.argv[2]
 
-            x_vals, results = run_experiment(N_runs, omit_unused=False, save_file=save_file)
+if __name__ == "__main__":
+    """Options to run:
+    python analyze_graph.py run <name of file to store experiment in> [--workers <amount of processes>]
+        [--betweenness sampled --pivots <amount of source nodes>] [--omit-unused]
+        [--food-paths] [--networks <directory to store the networks in>] [--images <directory to store images in>]
+    python analyze_graph.py plot <name of file that contains experiment to plot>
+    python analyze_graph.py node_hist
+        This creates a histogram with node degrees in the graph.
+    python analyze_graph.py bench_paths
+        This compares the run time of the shortest path methods on all cities.
+    """
+    N_runs = 5
 
-            if not save_file:
-                plot_data(x_vals, results)
-        elif command == 'node_hist':
-            plot_node_distribution()
-    else:
-        print("Please provide a command (run, plot or node_hist)")
+    parser = argparse.ArgumentParser()
+    parser.add_argument("command", choices=["run", "plot", "node_hist", "bench_paths"])
+    parser.add_argument("filename", nargs="?", default=None)
+    parser.add_argument("--workers", type=int, default=1, help="amount of processes to run the simulations on")
+    parser.add_argument("--seed", type=int, default=None, help="seed of the experiment")
+    parser.add_argument("--betweenness", choices=BETWEENNESS_MODES, default="exact",
+                        help="compute the betweenness exactly or estimate it from sampled source nodes")
+    parser.add_argument("--pivots", type=int, default=100, help="amount of source nodes in the sampled mode")
+    parser.add_argument("--omit-unused", action="store_true",
+                        help="only keep the edges on shortest paths between food sources")
+    parser.add_argument("--networks", default=None, help="directory to store the network of every simulation in")
+    parser.add_argument("--images", default=None, help="directory to store an image of every network in")
+    parser.add_argument("--food-paths", action="store_true",
+                        help="only average the shortest path lengths between food sources")
+    args = parser.parse_args()
+
+    # Plot the data from the specified file
+    if args.command == 'plot':
+        if args.filename:
+            x_vals, results, N_runs = load_data(args.filename)
+            plot_data(x_vals, results, N_runs)
+        else:
+            print("please provide file to load and plot")
+    # Run the data with the current parameters and save it in the specified file
+    elif args.command == 'run':
+        x_vals, results = run_experiment(N_runs, omit_unused=args.omit_unused, save_file=args.filename,
+                                         workers=args.workers, seed=args.seed, betweenness=args.betweenness,
+                                         pivots=args.pivots, food_paths=args.food_paths, network_dir=args.networks,
+                                         image_dir=args.images)
+
+        if not args.filename:
+            plot_data(x_vals, results, N_runs)
+    elif args.command == 'node_hist':
+        plot_node_distribution(args.seed)
+    elif args.command == 'bench_paths':
+        benchmark_shortest_paths(seed=args.seed if args.seed is not None else 0)
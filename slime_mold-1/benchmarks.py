@@ -0,0 +1,299 @@
+import argparse
+import json
+import os
+import platform
+import time
+import numpy as np
+from analyze_graph import (CITIES, extract_backbone, get_all_shortest_paths, get_average_betweenness,
+                           get_average_node_degree, get_average_shortest_path_length)
+from chem_field import compute_chem_field
+from csr_graph import CSRGraph
+from helpers import PACKAGE_DIR, TOKYO_COORDS_FILE, reduce_graph, text_to_coords
+from model import SlimeModel
+from read_geo_data import get_city_grid
+
+# Food maps of the benchmarks: the seven cities in data/ and the Tokyo map, which is drawn on a 100 x 100 grid
+MAPS = CITIES + ["tokyo"]
+TOKYO_SIZE = 100
+
+GROUPS = ["field", "steps", "reduce", "paths", "metrics"]
+ENGINES = ["agents", "array"]
+SIZES = [50, 100, 200]
+BASELINE_FILE = os.path.join(PACKAGE_DIR, "benchmark_baseline.json")
+
+
+def get_food_coords(map_name, size):
+    """
+    Function that places the food sources of a map on a grid.
+
+    Args:
+        map_name: name of a city in data/ or "tokyo".
+        size: width and height of the grid (int).
+
+    Returns:
+        list of (x, y) coordinates of the food sources.
+    """
+    if map_name != "tokyo":
+        return get_city_grid(map_name, size, size)
+
+    # Scale the Tokyo map to the grid, keeping one food source per cell
+    coords = [(x * size // TOKYO_SIZE, y * size // TOKYO_SIZE) for x, y in text_to_coords(TOKYO_COORDS_FILE)]
+
+    return list(dict.fromkeys(coords))
+
+
+def time_function(function, repeat, setup=None):
+    """
+    Function that times a function a number of times.
+
+    Args:
+        function: function to time, called with the output of setup if given.
+        repeat: amount of times to run the function (int).
+        setup: optional function that prepares the argument of every run, which is not timed.
+
+    Returns:
+        times: list of the run times in seconds.
+        output: output of the last run.
+    """
+    times = []
+
+    for _ in range(repeat):
+        args = () if setup is None else (setup(),)
+        start = time.perf_counter()
+        output = function(*args)
+        times.append(time.perf_counter() - start)
+
+    return times, output
+
+
+def to_value(output):
+    """Converts the output of a benchmark to a JSON value that is compared with the baseline."""
+    return round(float(output), 9)
+
+
+def grow_network(food_coords, size, N_steps, seed):
+    """Runs the array engine to get the network that the analysis benchmarks work on."""
+    model = SlimeModel(size, size, food_coords=food_coords, seed=seed, engine="array", chem_cache=False)
+
+    return model.run(N_steps)
+
+
+def copy_connections(connections):
+    """Returns a copy of a connections dictionary that can be reduced without changing the original."""
+    return {node: set(links) for node, links in connections.items()}
+
+
+def run_benchmarks(groups=GROUPS, maps=MAPS, sizes=SIZES, engines=ENGINES, size=100, N_steps=200, seed=0, repeat=3,
+                   pivots=100, verbose=True):
+    """
+    Function that runs the benchmark suite. Every benchmark uses fixed seeds, so its output is the same on every run
+    and is stored next to its run times.
+
+    Args:
+        groups: benchmark groups to run, see GROUPS.
+            field: computing the chemical field of every map at every grid size.
+            steps: simulation steps per second of every engine and map at every grid size.
+            reduce: reducing the grown network of every map with reduce_graph.
+            paths: finding the shortest paths between the food sources with get_all_shortest_paths, and only their
+                   lengths.
+            metrics: every metric of analyze_graph on the reduced network of every map.
+        maps: names of the food maps, see MAPS.
+        sizes: grid sizes of the field and steps benchmarks.
+        engines: engines of the steps benchmark.
+        size: grid size of the networks of the reduce, paths and metrics benchmarks (int).
+        N_steps: amount of simulation steps (int).
+        seed: seed of the simulations and of the sampled betweenness (int).
+        repeat: amount of times every benchmark is run, the fastest run is the result (int).
+        pivots: amount of source nodes of the sampled betweenness (int).
+        verbose: Boolean indicating whether to print every result.
+
+    Returns:
+        dict: per benchmark name the "times" of the runs in seconds, the fastest run "seconds", the "value" of its
+              output and for the steps benchmark the amount of "steps_per_second".
+    """
+    results = {}
+
+    def record(name, times, value, **extra):
+        """Stores the result of a benchmark."""
+        results[name] = {"seconds": min(times), "times": times, "value": to_value(value), **extra}
+
+        if verbose:
+            print(f"{name}: {min(times):.4f}s" + "".join(f", {key} {val:.1f}" for key, val in extra.items()))
+
+    for map_name in maps:
+        if "field" in groups:
+            for grid_size in sizes:
+                food_coords = get_food_coords(map_name, grid_size)
+                times, field = time_function(lambda: compute_chem_field(grid_size, grid_size, food_coords, 1), repeat)
+                record(f"field/{map_name}/{grid_size}", times, field.sum())
+
+        if "steps" in groups:
+            for grid_size in sizes:
+                food_coords = get_food_coords(map_name, grid_size)
+
+                for engine in engines:
+                    def setup():
+                        return SlimeModel(grid_size, grid_size, food_coords=food_coords, seed=seed, engine=engine,
+                                          chem_cache=False)
+
+                    times, connections = time_function(lambda model: model.run(N_steps), repeat, setup)
+                    record(f"steps/{engine}/{map_name}/{grid_size}", times, len(connections),
+                           steps_per_second=N_steps / min(times))
+
+        if not {"reduce", "paths", "metrics"} & set(groups):
+            continue
+
+        food_coords = get_food_coords(map_name, size)
+        connections = grow_network(food_coords, size, N_steps, seed)
+
+        if "reduce" in groups:
+            times, reduced = time_function(lambda graph: reduce_graph(graph, food_coords), repeat,
+                                           lambda: copy_connections(connections))
+            record(f"reduce/{map_name}", times, len(reduced))
+
+        reduced = reduce_graph(copy_connections(connections), food_coords)
+
+        if "paths" in groups:
+            times, paths = time_function(lambda: get_all_shortest_paths(reduced, food_coords), repeat)
+            record(f"paths/{map_name}", times, sum(len(path) for path in paths.values() if path))
+
+            times, lengths = time_function(lambda: get_all_shortest_paths(reduced, food_coords, return_paths=False),
+                                           repeat)
+            record(f"path_lengths/{map_name}", times, sum(length for length in lengths.values() if length is not None))
+
+        if "metrics" in groups:
+            graph = CSRGraph.from_connections(reduced)
+            metrics = {
+                "path_length": lambda: get_average_shortest_path_length(graph),
+                "food_path_length": lambda: get_average_shortest_path_length(graph, food_nodes=food_coords),
+                "degree": lambda: get_average_node_degree(graph),
+                "betweenness": lambda: get_average_betweenness(graph),
+                "sampled_betweenness": lambda: get_average_betweenness(graph, "sampled", pivots, seed=seed),
+                "backbone": lambda: extract_backbone(graph, food_coords)[0].size(weight=True),
+            }
+
+            for metric, function in metrics.items():
+                times, value = time_function(function, repeat)
+                record(f"metrics/{metric}/{map_name}", times, value)
+
+    return results
+
+
+def save_results(path, results, settings):
+    """
+    Function that writes benchmark results to a JSON file.
+
+    Args:
+        path: path of the JSON file.
+        results: results of run_benchmarks.
+        settings: dictionary with the arguments of run_benchmarks.
+    """
+    data = {
+        "machine": {
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "processor": platform.processor(),
+            "cpus": os.cpu_count(),
+        },
+        "date": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "settings": settings,
+        "results": results,
+    }
+
+    with open(path, "w") as fp:
+        json.dump(data, fp, indent=1)
+
+
+def compare_results(results, baseline, tolerance=0.25):
+    """
+    Function that compares benchmark results with a baseline and prints the change of every benchmark.
+
+    Args:
+        results: results of run_benchmarks.
+        baseline: results of an earlier run_benchmarks.
+        tolerance: relative change in time that is reported as slower or faster (float).
+
+    Returns:
+        slower: names of the benchmarks that became slower than the tolerance.
+        changed: names of the benchmarks whose output differs from the baseline.
+    """
+    slower = []
+    changed = []
+
+    for name in sorted(results.keys() & baseline.keys()):
+        old = baseline[name]["seconds"]
+        new = results[name]["seconds"]
+        ratio = new / old if old > 0 else np.inf
+        status = ""
+
+        if ratio > 1 + tolerance:
+            status = "slower"
+            slower.append(name)
+        elif ratio < 1 / (1 + tolerance):
+            status = "faster"
+
+        if not np.isclose(results[name]["value"], baseline[name]["value"]):
+            status += " output changed"
+            changed.append(name)
+
+        print(f"{name:<40} {old:10.4f}s {new:10.4f}s {ratio:7.2f}x {status}")
+
+    for name in sorted(results.keys() - baseline.keys()):
+        print(f"{name:<40} {'':>11} {results[name]['seconds']:10.4f}s (not in baseline)")
+
+    return slower, changed
+
+
+if __name__ == "__main__":
+    """Options to run:
+    python benchmarks.py [--groups field steps reduce paths metrics] [--maps <names>] [--sizes <grid sizes>]
+        [--repeat <amount>] [--output <results file>] [--baseline <file>] [--save-baseline]
+    """
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--groups", nargs="+", choices=GROUPS, default=GROUPS, help="benchmark groups to run")
+    parser.add_argument("--maps", nargs="+", choices=MAPS, default=MAPS, help="food maps to run the benchmarks on")
+    parser.add_argument("--sizes", nargs="+", type=int, default=SIZES,
+                        help="grid sizes of the field and steps benchmarks")
+    parser.add_argument("--engines", nargs="+", choices=ENGINES, default=ENGINES,
+                        help="engines of the steps benchmark")
+    parser.add_argument("--size", type=int, default=100, help="grid size of the networks that are analysed")
+    parser.add_argument("--steps", type=int, default=200, help="amount of simulation steps")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the simulations")
+    parser.add_argument("--repeat", type=int, default=3, help="amount of runs per benchmark, the fastest is kept")
+    parser.add_argument("--pivots", type=int, default=100, help="amount of source nodes of the sampled betweenness")
+    parser.add_argument("--output", default="benchmark_results.json", help="file to store the results in")
+    parser.add_argument("--baseline", default=BASELINE_FILE, help="results file to compare with")
+    parser.add_argument("--save-baseline", action="store_true", help="store the results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="relative change in time that is reported as slower or faster")
+    parser.add_argument("--fail-on-regression", action="store_true",
+                        help="exit with an error if a benchmark became slower or its output changed")
+    args = parser.parse_args()
+
+    settings = {"groups": args.groups, "maps": args.maps, "sizes": args.sizes, "engines": args.engines,
+                "size": args.size, "N_steps": args.steps, "seed": args.seed, "repeat": args.repeat,
+                "pivots": args.pivots}
+    results = run_benchmarks(**settings)
+    save_results(args.output, results, settings)
+    print(f"Results stored in {args.output}")
+
+    if args.save_baseline:
+        save_results(args.baseline, results, settings)
+        print(f"Baseline stored in {args.baseline}")
+    elif os.path.exists(args.baseline):
+        with open(args.baseline, "r") as fp:
+            baseline = json.load(fp)
+
+        if {key: baseline["settings"].get(key) for key in ["size", "N_steps", "seed", "pivots"]} != \
+                {key: settings[key] for key in ["size", "N_steps", "seed", "pivots"]}:
+            print("Warning: the baseline was run with different settings, outputs are not comparable")
+
+        print(f"\nComparison with {args.baseline} ({baseline['date']}):")
+        slower, changed = compare_results(results, baseline["results"], args.tolerance)
+        print(f"{len(slower)} slower, {len(changed)} with a changed output")
+
+        if args.fail_on_regression and (slower or changed):
+            raise SystemExit(1)
+    else:
+        print(f"No baseline found at {args.baseline}, store one with --save-baseline")
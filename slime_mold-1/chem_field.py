@@ -0,0 +1,166 @@
+from collections import OrderedDict
+import hashlib
+import os
+import numpy as np
+
+# Upper bound on the number of values held per chunk of food sources (32 MiB of float64)
+MAX_CHUNK_ELEMENTS = 2**22
+
+# Default location and in-memory size cap of the chemical field cache
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".chem_cache")
+MAX_CACHE_BYTES = 2**30
+
+
+def compute_chem_field(width, height, food_coords, signal_strength, max_chunk_elements=MAX_CHUNK_ELEMENTS):
+    """
+    Function that computes the chemical attraction field of all food sources at once.
+    The contribution of every food source to every grid cell is computed with broadcast array math, chunked over the
+    food sources to bound memory, and accumulated in the same order as placing the food agents one by one.
+
+    Args:
+        width: width of the grid (int).
+        height: height of the grid (int).
+        food_coords: list of (x, y) coordinates of the food sources (int, int).
+        signal_strength: base attraction strength of a food source (float).
+        max_chunk_elements: maximum number of values computed in one chunk of food sources (int).
+
+    Returns:
+        chem_values: NumPy array of shape (width, height) containing the attraction of every grid cell.
+    """
+    chem_values = np.zeros((width, height))
+    food = np.asarray(food_coords, dtype=np.int64).reshape(-1, 2)
+
+    if len(food) == 0:
+        return chem_values
+
+    # The attraction only depends on the squared distance, so compute it once for every possible squared distance.
+    # float_power matches the rounding of the scalar power used when the field was built cell by cell.
+    max_dx = max(width - 1 - food[:, 0].min(), food[:, 0].max())
+    max_dy = max(height - 1 - food[:, 1].min(), food[:, 1].max())
+    squared_dists = np.arange(max_dx**2 + max_dy**2 + 1)
+    attraction = signal_strength / np.float_power(np.sqrt(squared_dists) + 1, 2.0)
+
+    x = np.arange(width, dtype=np.int64)
+    y = np.arange(height, dtype=np.int64)
+    chunk_size = max(1, max_chunk_elements // max(1, width * height))
+
+    for start in range(0, len(food), chunk_size):
+        chunk = food[start:start + chunk_size]
+
+        # Squared distances of shape (chunk, width, height) between the food sources in the chunk and all grid cells
+        dx_squared = (x[None, :] - chunk[:, 0, None])**2
+        dy_squared = (y[None, :] - chunk[:, 1, None])**2
+        contributions = attraction[dx_squared[:, :, None] + dy_squared[:, None, :]]
+
+        # Sum sequentially so the result is identical to adding the food sources one at a time
+        for contribution in contributions:
+            chem_values += contribution
+
+    return chem_values
+
+
+class ChemFieldCache:
+    """On-disk and in-memory (LRU) cache of chemical fields, so models with the same food sources share one field."""
+    def __init__(self, directory=CACHE_DIR, max_bytes=MAX_CACHE_BYTES):
+        """
+        Initialize the cache.
+
+        Args:
+            directory: directory in which the fields are stored as .npy files (str).
+            max_bytes: maximum total size of the fields kept in memory (int).
+        """
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.n_bytes = 0
+        self.fields = OrderedDict()
+
+    @staticmethod
+    def get_key(width, height, food_coords, signal_strength):
+        """
+        Function that creates the key of a chemical field.
+
+        Args:
+            width: width of the grid (int).
+            height: height of the grid (int).
+            food_coords: list of (x, y) coordinates of the food sources (int, int).
+            signal_strength: base attraction strength of a food source (float).
+
+        Returns:
+            string containing the hash of the food coordinates, the grid dimensions and the signal strength.
+        """
+        food = np.ascontiguousarray(food_coords, dtype=np.int64).reshape(-1, 2)
+        food_hash = hashlib.sha1(food.tobytes()).hexdigest()
+
+        return f"{food_hash}_{width}x{height}_{float(signal_strength).hex()}"
+
+    def get(self, width, height, food_coords, signal_strength):
+        """
+        Function that returns the chemical field, loading it from memory or disk or computing and storing it otherwise.
+
+        Args:
+            width: width of the grid (int).
+            height: height of the grid (int).
+            food_coords: list of (x, y) coordinates of the food sources (int, int).
+            signal_strength: base attraction strength of a food source (float).
+
+        Returns:
+            read-only (memory-mapped) NumPy array of shape (width, height) containing the attraction of every grid cell.
+        """
+        key = self.get_key(width, height, food_coords, signal_strength)
+
+        if key in self.fields:
+            self.fields.move_to_end(key)
+            return self.fields[key]
+
+        path = os.path.join(self.directory, key + ".npy")
+
+        if not os.path.exists(path):
+            chem_values = compute_chem_field(width, height, food_coords, signal_strength)
+
+            # Write to a temporary file first so other processes never read a partially written field
+            os.makedirs(self.directory, exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, "wb") as fp:
+                np.save(fp, chem_values)
+            os.replace(tmp_path, path)
+
+        # Plain array view on the memory-mapped file, avoiding the memmap subclass overhead on every lookup
+        chem_values = np.asarray(np.load(path, mmap_mode='r'))
+        self.fields[key] = chem_values
+        self.n_bytes += chem_values.nbytes
+
+        # Evict least recently used fields once the size cap is exceeded
+        while self.n_bytes > self.max_bytes and len(self.fields) > 1:
+            _, evicted = self.fields.popitem(last=False)
+            self.n_bytes -= evicted.nbytes
+
+        return chem_values
+
+    def clear(self):
+        """Function that empties the in-memory part of the cache."""
+        self.fields.clear()
+        self.n_bytes = 0
+
+
+_cache = None
+
+
+def get_chem_field(width, height, food_coords, signal_strength):
+    """
+    Function that returns the chemical field from the shared default cache.
+
+    Args:
+        width: width of the grid (int).
+        height: height of the grid (int).
+        food_coords: list of (x, y) coordinates of the food sources (int, int).
+        signal_strength: base attraction strength of a food source (float).
+
+    Returns:
+        read-only NumPy array of shape (width, height) containing the attraction of every grid cell.
+    """
+    global _cache
+
+    if _cache is None:
+        _cache = ChemFieldCache()
+
+    return _cache.get(width, height, food_coords, signal_strength)
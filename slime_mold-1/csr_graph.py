@@ -0,0 +1,378 @@
+from functools import cached_property
+import zipfile
+import numpy as np
+
+# Arrays stored in a network file
+NETWORK_ARRAYS = ["nodes", "indptr", "indices", "weights"]
+
+
+def load_npz_mmap(path):
+    """
+    Function that memory-maps the arrays of an uncompressed .npz file, which stores every array as a .npy file
+    in a zip archive without compression.
+
+    Args:
+        path: path of the .npz file.
+
+    Returns:
+        dictionary with a read-only memory-mapped array per name in NETWORK_ARRAYS, None if the file is compressed.
+    """
+    arrays = {}
+
+    with zipfile.ZipFile(path) as archive, open(path, "rb") as fp:
+        for name in NETWORK_ARRAYS:
+            info = archive.getinfo(name + ".npy")
+
+            if info.compress_type != zipfile.ZIP_STORED:
+                return None
+
+            # Skip the local file header of the zip member and the header of the .npy file
+            fp.seek(info.header_offset + 26)
+            name_length, extra_length = np.frombuffer(fp.read(4), dtype="<u2").tolist()
+            fp.seek(info.header_offset + 30 + name_length + extra_length)
+
+            if np.lib.format.read_magic(fp) == (1, 0):
+                shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(fp)
+            else:
+                shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(fp)
+
+            if np.prod(shape) == 0:
+                arrays[name] = np.zeros(shape, dtype=dtype)
+            else:
+                arrays[name] = np.memmap(fp, dtype=dtype, mode="r", offset=fp.tell(), shape=shape,
+                                         order="F" if fortran_order else "C")
+
+    return arrays
+
+
+class CSRGraph:
+    """
+    Compact array-backed undirected graph of a slime network.
+    Nodes are numbered by their position in nodes, and the neighbours of node i are indices[indptr[i]:indptr[i + 1]]
+    with the edge costs in the same positions of weights. Every undirected edge is stored in both directions.
+    """
+    def __init__(self, nodes, indptr, indices, weights):
+        """
+        Initialize the graph from its CSR arrays.
+
+        Args:
+            nodes: NumPy array of shape (n, 2) with the (x, y) coordinates of the nodes.
+            indptr: NumPy array of length n + 1 with the offsets of the neighbours of every node.
+            indices: NumPy array with the neighbouring node indices.
+            weights: NumPy array with the cost of every edge in indices.
+        """
+        self.nodes = np.asarray(nodes).reshape(-1, 2)
+        self.indptr = np.asarray(indptr)
+        self.indices = np.asarray(indices)
+        self.weights = np.asarray(weights, dtype=float)
+
+    @cached_property
+    def index(self):
+        """Dictionary that maps the (x, y) coordinate tuple of every node to its index."""
+        return {node: i for i, node in enumerate(map(tuple, self.nodes.tolist()))}
+
+    @classmethod
+    def from_edges(cls, nodes, edges, weights):
+        """
+        Function that builds a graph from an edge list.
+        Edges may be listed in one or both directions, of duplicate edges only the lowest cost is kept.
+
+        Args:
+            nodes: array-like of shape (n, 2) with the (x, y) coordinates of the nodes.
+            edges: array-like of shape (m, 2) with the node indices of every edge.
+            weights: array-like of length m with the cost of every edge.
+
+        Returns:
+            CSRGraph object.
+        """
+        nodes = np.asarray(nodes, dtype=np.int64).reshape(-1, 2)
+        edges = np.asarray(edges, dtype=np.int64).reshape(-1, 2)
+        weights = np.asarray(weights, dtype=float)
+        n = len(nodes)
+
+        # Store both directions, sorted by source, target and cost so the cheapest duplicate comes first
+        sources = np.concatenate([edges[:, 0], edges[:, 1]])
+        targets = np.concatenate([edges[:, 1], edges[:, 0]])
+        weights = np.concatenate([weights, weights])
+        order = np.lexsort((weights, targets, sources))
+        sources, targets, weights = sources[order], targets[order], weights[order]
+
+        unique = np.ones(len(sources), dtype=bool)
+        unique[1:] = (sources[1:] != sources[:-1]) | (targets[1:] != targets[:-1])
+        sources, targets, weights = sources[unique], targets[unique], weights[unique]
+
+        indptr = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(np.bincount(sources, minlength=n), out=indptr[1:])
+
+        return cls(nodes, indptr, targets, weights)
+
+    @classmethod
+    def from_connections(cls, connections):
+        """
+        Function that builds a graph from the connections dictionary of a SlimeModel.
+
+        Args:
+            connections: dictionary containing (x, y) coordinate tuples as keys and sets of ((x, y), cost) tuples as
+                         values representing connected coordinates.
+
+        Returns:
+            CSRGraph object with the nodes in the order of the connections dictionary.
+        """
+        index = {node: i for i, node in enumerate(connections)}
+        edges = []
+
+        for node, links in connections.items():
+            for next_node, cost in links:
+                edges.append((index[node], index.setdefault(next_node, len(index)), cost))
+
+        edges = np.array(edges, dtype=float).reshape(-1, 3)
+
+        return cls.from_edges(list(index), edges[:, :2].astype(np.int64), edges[:, 2])
+
+    @classmethod
+    def from_networkx(cls, graph):
+        """Function that builds a graph from a networkx.Graph with (x, y) coordinate tuples as nodes."""
+        index = {node: i for i, node in enumerate(graph.nodes)}
+        edges = [(index[a], index[b], w) for a, b, w in graph.edges(data='weight', default=1)]
+        edges = np.array(edges, dtype=float).reshape(-1, 3)
+
+        return cls.from_edges(list(index), edges[:, :2].astype(np.int64), edges[:, 2])
+
+    @classmethod
+    def load(cls, path, mmap=True):
+        """
+        Function that loads a graph stored with save.
+
+        Args:
+            path: path of the .npz file.
+            mmap: Boolean indicating whether to memory-map the arrays of an uncompressed file instead of reading
+                  them; default True.
+
+        Returns:
+            CSRGraph object.
+        """
+        if mmap:
+            arrays = load_npz_mmap(path)
+
+            if arrays is not None:
+                return cls(**arrays)
+
+        with np.load(path) as arrays:
+            return cls(**{name: arrays[name] for name in NETWORK_ARRAYS})
+
+    def save(self, path, compress=False):
+        """
+        Function that stores the graph as an .npz file with its CSR arrays in compact types.
+
+        Args:
+            path: path of the .npz file.
+            compress: Boolean indicating whether to compress the file, compressed files can not be memory-mapped;
+                      default False.
+        """
+        save = np.savez_compressed if compress else np.savez
+        save(path, nodes=self.nodes.astype(np.int32), indptr=self.indptr.astype(np.int64),
+             indices=self.indices.astype(np.int32), weights=self.weights)
+
+    def to_connections(self):
+        """Returns the graph as a connections dictionary like the one of a SlimeModel."""
+        nodes = [tuple(node) for node in self.nodes.tolist()]
+        indptr = self.indptr.tolist()
+        indices = self.indices.tolist()
+        weights = self.weights.tolist()
+
+        return {node: {(nodes[indices[k]], weights[k]) for k in range(indptr[i], indptr[i + 1])}
+                for i, node in enumerate(nodes)}
+
+    @property
+    def n_nodes(self):
+        """Amount of nodes in the graph."""
+        return len(self.nodes)
+
+    @property
+    def n_edges(self):
+        """Amount of undirected edges in the graph."""
+        return len(self.indices) // 2
+
+    def edge_subgraph(self, edges):
+        """
+        Function that builds the subgraph with only the given edges and the nodes they connect.
+
+        Args:
+            edges: array-like of shape (m, 2) with the node indices of every edge to keep.
+
+        Returns:
+            CSRGraph object with the nodes in their original order.
+
+        Raises:
+            ValueError: if an edge is not in the graph.
+        """
+        n = self.n_nodes
+        edges = np.asarray(edges, dtype=np.int64).reshape(-1, 2)
+
+        # Look up the cost of every edge in the flattened (source, target) keys. The neighbours of every node are
+        # sorted in graphs built with from_edges, other graphs (e.g. loaded from a file) are sorted here.
+        keys = np.repeat(np.arange(n), np.diff(self.indptr)) * n + self.indices.astype(np.int64)
+        order = None
+
+        if np.any(keys[1:] < keys[:-1]):
+            order = np.argsort(keys, kind="stable")
+            keys = keys[order]
+
+        wanted = edges[:, 0] * n + edges[:, 1]
+        positions = np.minimum(np.searchsorted(keys, wanted), max(len(keys) - 1, 0))
+
+        if len(wanted) and (len(keys) == 0 or np.any(keys[positions] != wanted)):
+            raise ValueError("edge_subgraph got edges that are not in the graph")
+
+        weights = self.weights[positions if order is None else order[positions]]
+
+        used, edges = np.unique(edges, return_inverse=True)
+
+        return CSRGraph.from_edges(self.nodes[used], edges.reshape(-1, 2), weights)
+
+    def matrix(self):
+        """Returns the graph as a scipy CSR adjacency matrix with the edge costs as values."""
+        from scipy.sparse import csr_matrix
+
+        return csr_matrix((self.weights, self.indices, self.indptr), shape=(self.n_nodes, self.n_nodes))
+
+    def get_indices(self, nodes):
+        """Returns a NumPy array with the indices of a list of (x, y) coordinate tuples that are part of the graph."""
+        return np.array([self.index[node] for node in nodes if node in self.index], dtype=np.int64)
+
+    def size(self, weight=False):
+        """Returns the amount of edges, or the total cost of all edges if weight is True (like networkx.Graph.size)."""
+        if weight:
+            return self.weights.sum() / 2
+
+        return self.n_edges
+
+    def degree(self, nodes=None):
+        """
+        Function that returns the degrees of the nodes.
+
+        Args:
+            nodes: optional list of (x, y) coordinate tuples, all nodes if None.
+
+        Returns:
+            NumPy array with the amount of neighbours of every (requested) node.
+        """
+        degrees = np.diff(self.indptr)
+
+        if nodes is None:
+            return degrees
+
+        return degrees[self.get_indices(nodes)]
+
+    def connected_components(self):
+        """
+        Function that labels the connected components of the graph.
+
+        Returns:
+            n_components: amount of connected components.
+            labels: NumPy array with the component label of every node.
+        """
+        from scipy.sparse import csgraph
+
+        return csgraph.connected_components(self.matrix(), directed=False)
+
+    def shortest_path_lengths(self, sources, weighted=True, return_predecessors=False):
+        """
+        Function that finds the shortest path lengths from a set of source nodes to all nodes with Dijkstra's
+        algorithm (or breadth-first search if not weighted).
+
+        Args:
+            sources: array-like of source node indices.
+            weighted: Boolean indicating whether to use the edge costs or count the amount of edges; default True.
+            return_predecessors: Boolean indicating whether to return the predecessor arrays as well; default False.
+
+        Returns:
+            dist: NumPy array of shape (sources, n) with the path lengths, inf for unreachable nodes.
+            predecessors: NumPy array of the same shape with the previous node on the shortest paths, -9999 for
+                          sources and unreachable nodes (only if return_predecessors is True).
+        """
+        from scipy.sparse import csgraph
+
+        return csgraph.shortest_path(self.matrix(), method='D', directed=False, unweighted=not weighted,
+                                     indices=np.asarray(sources, dtype=np.int64),
+                                     return_predecessors=return_predecessors)
+
+    def get_path(self, predecessors, target):
+        """
+        Function that follows a row of predecessors from a target back to the source of the search.
+
+        Args:
+            predecessors: row of a predecessor array returned by shortest_path_lengths.
+            target: index of the target node.
+
+        Returns:
+            list of (x, y) coordinate tuples from source to target.
+        """
+        path = [target]
+
+        while predecessors[path[-1]] >= 0:
+            path.append(predecessors[path[-1]])
+
+        return [tuple(node) for node in self.nodes[path[::-1]].tolist()]
+
+    def path_length_sums(self, sources, targets=None, weighted=True, chunk_size=256):
+        """
+        Function that sums the shortest path lengths from every source node to all target nodes it can reach.
+
+        Args:
+            sources: array-like of source node indices.
+            targets: optional array-like of target node indices, all nodes if None.
+            weighted: Boolean indicating whether to use the edge costs or count the amount of edges; default True.
+            chunk_size: amount of sources to search at once, bounds the memory to chunk_size * n distances.
+
+        Returns:
+            NumPy array of shape (2, sources) with the summed path lengths and the amount of reachable targets
+            (excluding the source itself) of every source.
+        """
+        sources = np.asarray(sources, dtype=np.int64)
+        sums = np.zeros((2, len(sources)))
+
+        for start in range(0, len(sources), chunk_size):
+            chunk = sources[start:start + chunk_size]
+            dist = self.shortest_path_lengths(chunk, weighted=weighted)
+            dist[np.arange(len(chunk)), chunk] = np.inf
+
+            if targets is not None:
+                dist = dist[:, targets]
+
+            reachable = np.isfinite(dist)
+            sums[0, start:start + chunk_size] = np.where(reachable, dist, 0).sum(axis=1)
+            sums[1, start:start + chunk_size] = reachable.sum(axis=1)
+
+        return sums
+
+    def dependency_totals(self, sources, chunk_size=256):
+        """
+        Function that computes the total dependency of every source node on all other nodes, which is the sum of
+        the betweenness contributions of a source. On unweighted shortest paths this equals the sum of (hops - 1)
+        over all nodes reachable from the source, so it only needs breadth-first search distances.
+
+        Args:
+            sources: array-like of source node indices.
+            chunk_size: amount of sources to search at once, bounds the memory to chunk_size * n distances.
+
+        Returns:
+            NumPy array with the total dependency of every source.
+        """
+        sums, counts = self.path_length_sums(sources, weighted=False, chunk_size=chunk_size)
+
+        return sums - counts
+
+    def to_networkx(self):
+        """Returns the graph as a networkx.Graph with (x, y) coordinate tuples as nodes and costs as weight."""
+        import networkx as nx
+
+        graph = nx.Graph()
+        nodes = [tuple(node) for node in self.nodes.tolist()]
+        graph.add_nodes_from(nodes)
+
+        sources = np.repeat(np.arange(self.n_nodes), np.diff(self.indptr))
+        graph.add_weighted_edges_from((nodes[a], nodes[b], w) for a, b, w in
+                                      zip(sources.tolist(), self.indices.tolist(), self.weights.tolist()) if a < b)
+
+        return graph
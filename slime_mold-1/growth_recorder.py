@@ -0,0 +1,258 @@
+import json
+import struct
+import numpy as np
+
+# A recording starts with the magic bytes, the length of the JSON header and the header itself,
+# followed by one block per step with the nodes and edges that were added in that step
+MAGIC = b"SLIMEREC"
+HEADER_LENGTH_BYTES = 8
+BLOCK_HEADER = struct.Struct("<iii")
+
+
+class GrowthRecorder:
+    """
+    Recorder that appends the nodes and edges a SlimeModel adds in every step to a binary file.
+    Nodes are numbered in order of appearance, so every node is stored once as an (x, y) pair and the edges of a step
+    only hold two node numbers and a cost. Recording the array engine on the Rome map for 300 steps takes about 5% of
+    the run time on 100 x 100 and 200 x 200 grids.
+    """
+    def __init__(self, path, model, flush_interval=50):
+        """
+        Start a new recording of a model, replacing any existing file.
+
+        Args:
+            path: path of the recording.
+            model: SlimeModel object to record, the model reports its new edges to the recorder through
+                   model.growth_log, as a flat list of x, y, x, y, cost values for the agents engine and as a list
+                   of tuples with an x, y, x, y and cost array for the array engine.
+            flush_interval: amount of steps that are buffered before they are written.
+        """
+        self.path = path
+        self.model = model
+        self.flush_interval = flush_interval
+        self.n_nodes = 0
+
+        # Number of the node on every grid cell, -1 for cells without a node
+        self.node_ids = np.full((model.width, model.height), -1, dtype=np.int64)
+
+        header = json.dumps({
+            "width": model.width,
+            "height": model.height,
+            "p_branch": model.p_branch,
+            "p_connect": model.p_connect,
+            "signal_strength": model.signal_strength,
+            "noise": model.noise,
+            "seed": model.seed_sequence.entropy,
+            "food_coords": list(model.food_locations.values()),
+        }).encode()
+
+        with open(path, "wb") as fp:
+            fp.write(MAGIC + len(header).to_bytes(HEADER_LENGTH_BYTES, "little") + header)
+
+        # The network at step 0 only holds the starting cells
+        model.growth_log = []
+        self.pending_steps = []
+        self.write_blocks([0], [0], np.array(list(model.connections), dtype=np.int64).reshape(-1, 2))
+
+    def record_step(self, step):
+        """
+        Function that marks the end of a step, the edges the model added since the previous step belong to it.
+        Steps are buffered and written in batches of flush_interval steps to keep the overhead per step low. The
+        buffered steps are only written by flush or close, which SlimeModel.run and SlimeModel.close call, so a
+        model that is advanced with step() has to be closed to complete its recording.
+
+        Args:
+            step: number of the step that was just finished (int).
+        """
+        if self.model.growth_log is None:
+            raise ValueError(f"The recording {self.path} is closed")
+
+        self.pending_steps.append((step, len(self.model.growth_log)))
+
+        if len(self.pending_steps) >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        """Function that writes the buffered steps to the recording."""
+        if not self.pending_steps:
+            return
+
+        steps, ends = zip(*self.pending_steps)
+        growth_log = self.model.growth_log
+
+        # The steps end at a position in the growth log, which holds a single value or the columns of edges per entry
+        if self.model.engine is None:
+            edges = np.array(growth_log, dtype=float).reshape(-1, 5)
+            ends = np.asarray(ends) // 5
+        elif growth_log:
+            edges = np.column_stack([np.concatenate(column) for column in zip(*growth_log)])
+            ends = np.cumsum([0] + [len(columns[0]) for columns in growth_log])[list(ends)]
+        else:
+            edges = None
+
+        self.model.growth_log = []
+        self.pending_steps = []
+
+        self.write_blocks(steps, ends, edges=edges)
+
+    def close(self):
+        """Function that writes the buffered steps and stops recording the model."""
+        if self.model.growth_log is not None:
+            self.flush()
+            self.model.growth_log = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def add_nodes(self, cells):
+        """
+        Function that numbers the cells without a node in order of their first appearance.
+
+        Args:
+            cells: NumPy array of shape (n, 2) with (x, y) coordinates.
+
+        Returns:
+            new_nodes: NumPy array of shape (k, 2) with the coordinates of the new nodes.
+            first: NumPy array with the index of the first appearance of every new node in cells.
+        """
+        unseen = np.flatnonzero(self.node_ids[cells[:, 0], cells[:, 1]] < 0)
+        keys = cells[unseen, 0] * self.model.height + cells[unseen, 1]
+        positions = np.arange(len(unseen))
+
+        # Find the first appearance of every unseen cell without sorting, the later appearances are duplicates
+        first_position = np.full(self.node_ids.size, len(unseen))
+        np.minimum.at(first_position, keys, positions)
+        first = unseen[first_position[keys] == positions]
+        new_nodes = cells[first]
+
+        self.node_ids[new_nodes[:, 0], new_nodes[:, 1]] = np.arange(self.n_nodes, self.n_nodes + len(new_nodes))
+        self.n_nodes += len(new_nodes)
+
+        return new_nodes, first
+
+    def write_blocks(self, steps, ends, nodes=None, edges=None):
+        """
+        Function that appends the blocks of consecutive steps to the recording.
+
+        Args:
+            steps: numbers of the steps.
+            ends: amount of edges up to and including every step.
+            nodes: NumPy array of shape (n, 2) with coordinates of nodes without edges, added in the first step.
+            edges: NumPy array of shape (m, 5) with the x, y, x, y and cost of the added edges.
+        """
+        if edges is None:
+            edges = np.zeros((0, 5))
+
+        cells = edges[:, :4].astype(np.int64).reshape(-1, 2)
+
+        if nodes is not None:
+            cells = np.concatenate([nodes, cells])
+
+        new_nodes, first = self.add_nodes(cells)
+        pairs = self.node_ids[cells[:, 0], cells[:, 1]][len(cells) - 2 * len(edges):].reshape(-1, 2)
+
+        # Every new node belongs to the step of the edge it first appears in
+        edge_ends = 2 * np.asarray(ends) + len(cells) - 2 * len(edges)
+        node_ends = np.searchsorted(first, edge_ends)
+        node_start = edge_start = 0
+
+        new_nodes = new_nodes.astype("<i4").tobytes()
+        pairs = pairs.astype("<i4").tobytes()
+        costs = edges[:, 4].astype("<f8").tobytes()
+        blocks = []
+
+        for step, edge_end, node_end in zip(steps, ends, node_ends.tolist()):
+            blocks += [BLOCK_HEADER.pack(step, node_end - node_start, edge_end - edge_start),
+                       new_nodes[8 * node_start:8 * node_end], pairs[8 * edge_start:8 * edge_end],
+                       costs[8 * edge_start:8 * edge_end]]
+            node_start, edge_start = node_end, edge_end
+
+        with open(self.path, "ab") as fp:
+            fp.write(b"".join(blocks))
+
+
+class GrowthRecording:
+    """Reader of a recording made by GrowthRecorder, which rebuilds the network as of any step."""
+    def __init__(self, path):
+        """
+        Read a recording.
+
+        Args:
+            path: path of the recording.
+        """
+        with open(path, "rb") as fp:
+            data = fp.read()
+
+        if data[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"{path} is not a growth recording")
+
+        offset = len(MAGIC) + HEADER_LENGTH_BYTES
+        length = int.from_bytes(data[len(MAGIC):offset], "little")
+        self.metadata = json.loads(data[offset:offset + length].decode())
+        offset += length
+
+        # Split the blocks, a block cut off by an interrupted run is ignored
+        self.blocks = []
+
+        while offset + BLOCK_HEADER.size <= len(data):
+            step, n_nodes, n_edges = BLOCK_HEADER.unpack_from(data, offset)
+            offset += BLOCK_HEADER.size
+            end = offset + 8 * n_nodes + 8 * n_edges + 8 * n_edges
+
+            if end > len(data):
+                break
+
+            nodes = np.frombuffer(data, dtype="<i4", count=2 * n_nodes, offset=offset).reshape(-1, 2)
+            edges = np.frombuffer(data, dtype="<i4", count=2 * n_edges, offset=offset + 8 * n_nodes).reshape(-1, 2)
+            costs = np.frombuffer(data, dtype="<f8", count=n_edges, offset=offset + 8 * n_nodes + 8 * n_edges)
+            self.blocks.append((step, nodes, edges, costs))
+            offset = end
+
+    @property
+    def last_step(self):
+        """Number of the last recorded step."""
+        return self.blocks[-1][0] if self.blocks else None
+
+    def frames(self):
+        """
+        Function that iterates over the recorded steps.
+
+        Yields:
+            step: number of the step.
+            nodes: NumPy array of shape (k, 2) with the coordinates of the nodes added in the step.
+            edges: NumPy array of shape (m, 2) with the node numbers of the edges added in the step.
+            costs: NumPy array with the cost of every added edge.
+        """
+        yield from self.blocks
+
+    def replay(self, step=None):
+        """
+        Function that rebuilds the network as it was at the end of a step.
+        The network holds every node and edge that grew, online reductions of the model are not recorded.
+
+        Args:
+            step: number of the step, the last recorded step if None.
+
+        Returns:
+            dictionary containing (x, y) coordinate tuples as keys and sets of ((x, y), cost) tuples as values, like
+            SlimeModel.connections.
+        """
+        nodes = []
+        connections = {}
+
+        for block_step, new_nodes, edges, costs in self.blocks:
+            if step is not None and block_step > step:
+                break
+
+            for node in map(tuple, new_nodes.tolist()):
+                nodes.append(node)
+                connections.setdefault(node, set())
+
+            for (a, b), cost in zip(edges.tolist(), costs.tolist()):
+                connections[nodes[a]].add((nodes[b], cost))
+                connections[nodes[b]].add((nodes[a], cost))
+
+        return connections
@@ -1,19 +1,42 @@
+import heapq
+import os
 import numpy as np
 
+# Directory of the modules and their data files, so the data is found from any working directory
+PACKAGE_DIR = os.path.dirname(os.path.abspath(__file__))
+TOKYO_COORDS_FILE = "tokyo_coords.txt"
+
+
+def get_data_path(file_name):
+    """
+    Function that resolves the path of a data file, a relative path that does not exist from the working directory is
+    looked up in the package directory.
+
+    Args:
+        file_name: path of the file.
+
+    Returns:
+        path of the file.
+    """
+    if os.path.isabs(file_name) or os.path.exists(file_name):
+        return file_name
+
+    return os.path.join(PACKAGE_DIR, file_name)
+
 
 def text_to_coords(file_name):
     """
     Function that converts a .txt file with two coordinates on each row into a list of coordinate tuples.
 
     Args:
-        file_name: name of the file read in.
+        file_name: name of the file read in, relative paths are also looked up in the package directory.
 
     Returns:
         coords: list of (x, y) coordinate tuples.
     """
     coords = []
 
-    with open(file_name, 'r') as f:
+    with open(get_data_path(file_name), 'r') as f:
         for coord in f:
             x, y = coord.split()
             coords.append((int(x), int(y)))
@@ -21,55 +44,139 @@ def text_to_coords(file_name):
     return coords
 
 
-def reduce_graph(graph, food_locations):
+def reduce_graph(graph, food_locations, keep_cheapest=False):
     """
     Function that reduces a graph by removing dead ends and simplifying twofold connected nodes.
+    The graph is reduced in passes over its nodes, where only nodes whose connections changed are revisited.
 
     Args:
         graph: dictionary containing locations (x, y) coordinate tuple as keys and sets of ((x, y), cost) tuples as values
                representing connected coordinates.
         food_locations: list of (x, y) coordinate tuples representing nodes that are not allowed to be removed.
+        keep_cheapest: Boolean indicating whether to keep the cheapest of parallel chains, like the online reduction
+                       of SlimeModel does, instead of the chain that is merged first.
     """
-    reduced = False
+    rank = dict(zip(graph, range(len(graph))))
+
+    return reduce_nodes(graph, list(graph), set(food_locations).__contains__, rank, keep_cheapest)
 
-    # Keep reducing until no more changes have been made
-    while not reduced:
-        changed = False
-        remove_list = []
 
-        for (node_0, links) in graph.items():
-            n = len(links)
+class LazyAdjacency(dict):
+    """Dictionary of connected coordinates to costs per node, converted from a graph when a node is first accessed."""
+    def __init__(self, graph):
+        """
+        Initialize an empty adjacency dictionary.
 
-            # Remove dead ends if they are not food locations
-            if n == 1 and node_0 not in food_locations:
-                (node_1, cost), = links
+        Args:
+            graph: dictionary containing (x, y) coordinate tuples as keys and sets of ((x, y), cost) tuples as values.
+        """
+        super().__init__()
 
-                graph[node_1].remove((node_0, cost))
-                remove_list.append(node_0)
+        self.graph = graph
 
-                changed = True
+    def __missing__(self, node):
+        links = self[node] = dict(self.graph[node])
+        return links
 
-            # Remove node if it has two links and connect those two links unless those nodes form a triangular path
-            elif n == 2 and node_0 not in food_locations:
-                ((node_1, cost_1), (node_2, cost_2)) = links
-                cost = round(cost_1 + cost_2, 3)
 
-                if not triangular_path(node_0, graph):
-                    graph[node_1].add((node_2, cost))
-                    graph[node_2].add((node_1, cost))
+def reduce_nodes(graph, nodes, is_protected, rank, keep_cheapest=False):
+    """
+    Function that removes dead ends and simplifies twofold connected nodes of a graph, starting from the given nodes.
+    Nodes are visited in passes ordered by rank, in which a node is only revisited when its connections changed after
+    it was visited. Any removal can therefore only cascade to the neighbours of removed nodes, and only the nodes that
+    are visited are converted to adjacency dictionaries.
+
+    Args:
+        graph: dictionary containing locations (x, y) coordinate tuple as keys and sets of ((x, y), cost) tuples as values
+               representing connected coordinates, which is reduced in place.
+        nodes: list of nodes to visit in the first pass, sorted by rank.
+        is_protected: function that returns True for nodes that are not allowed to be removed.
+        rank: dictionary that gives the position of every node within a pass.
+        keep_cheapest: Boolean indicating whether to keep the cheapest of two parallel chains between the same
+                       nodes, otherwise the chain that is merged first is kept. Only the cheapest chain does not
+                       depend on the order in which the nodes are reduced.
 
+    Returns:
+        graph: the reduced graph.
+    """
+    adjacency = LazyAdjacency(graph)
+    removed = set()
+    changed = set()
+    revisit = set()
+    pending = []
 
-                graph[node_1].remove((node_0, cost_1))
-                graph[node_2].remove((node_0, cost_2))
-                remove_list.append(node_0)
+    def visit(node_0, position):
+        """Reduce a single node and schedule the neighbours whose connections changed."""
+        if node_0 in removed or is_protected(node_0):
+            return
 
-                changed = True
+        links = adjacency[node_0]
+        n = len(links)
 
-        # Remove unnecessary nodes once out of dictionary loop
-        for node in remove_list:
-            del graph[node]
-        if not changed:
-            reduced = True
+        # Remove dead ends if they are not protected
+        if n == 1:
+            (node_1, _), = links.items()
+
+            del adjacency[node_1][node_0]
+            neighbours = (node_1,)
+
+        # Remove node if it has two links and connect those two links unless those nodes form a triangular path,
+        # with keep_cheapest the chain through the node replaces the existing link of the triangle if it is cheaper
+        elif n == 2:
+            ((node_1, cost_1), (node_2, cost_2)) = links.items()
+            links_1 = adjacency[node_1]
+            links_2 = adjacency[node_2]
+            cost = round(cost_1 + cost_2, 3)
+
+            if node_2 not in links_1 or node_1 not in links_2 or (keep_cheapest and cost < links_1[node_2]):
+                links_1[node_2] = cost
+                links_2[node_1] = cost
+
+            del links_1[node_0]
+            del links_2[node_0]
+            neighbours = (node_1, node_2)
+        else:
+            return
+
+        del adjacency[node_0]
+        removed.add(node_0)
+
+        # Visit changed neighbours later in this pass if they have not been visited yet, otherwise in the next pass
+        for node in neighbours:
+            changed.add(node)
+
+            if rank[node] <= position:
+                revisit.add(node)
+            elif node not in in_pass:
+                in_pass.add(node)
+                heapq.heappush(pending, (rank[node], node))
+
+    while nodes:
+        # Nodes of this pass are visited in order, changed nodes that are not part of it are merged in with a heap
+        in_pass = set(nodes)
+
+        for node_0 in nodes:
+            position = rank[node_0]
+
+            while pending and pending[0][0] < position:
+                pending_position, node = heapq.heappop(pending)
+                visit(node, pending_position)
+
+            visit(node_0, position)
+
+        while pending:
+            pending_position, node = heapq.heappop(pending)
+            visit(node, pending_position)
+
+        nodes = sorted(revisit - removed, key=rank.__getitem__)
+        revisit = set()
+
+    # Remove reduced nodes and write back the changed connections
+    for node in removed:
+        del graph[node]
+
+    for node in changed - removed:
+        graph[node] = set(adjacency[node].items())
 
     return graph
 
@@ -90,11 +197,8 @@ def triangular_path(node, graph):
     # Unpacking two ((x, y), cost) tuples
     (node_1, _), (node_2, _) = graph[node]
 
-    # Splitting coordinates from costs
-    coordinates_1, _ = zip(*graph[node_1])
-    coordinates_2, _ = zip(*graph[node_2])
-
-    return node_2 in coordinates_1 and node_1 in coordinates_2
+    return (any(coordinate == node_2 for coordinate, _ in graph[node_1]) and
+            any(coordinate == node_1 for coordinate, _ in graph[node_2]))
 
 
 def get_distance(start, end):
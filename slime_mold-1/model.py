@@ -1,9 +1,12 @@
-from agents import FoodAgent, SlimeAgent
+from agents import EMPTY, SLIME, FoodAgent, SlimeAgent
+from chem_field import compute_chem_field, get_chem_field
 from mesa import Model
 from mesa.time import BaseScheduler
 from mesa.space import MultiGrid
 import numpy as np
-from helpers import text_to_coords
+from growth_recorder import GrowthRecorder
+from helpers import TOKYO_COORDS_FILE, reduce_nodes, text_to_coords
+from slime_engine import ArrayEngine
 
 
 class Grid(MultiGrid):
@@ -33,11 +36,29 @@ class Grid(MultiGrid):
         return self.grid[x][y]
 
 
+def spawn_seeds(seed, n):
+    """
+    Function that derives independent seeds for replicate runs from a single seed.
+
+    Args:
+        seed: seed to derive the seeds from (int, numpy.random.SeedSequence or None).
+        n: amount of seeds (int).
+
+    Returns:
+        list of n seeds (int) that each give the model an independent random number stream.
+    """
+    if not isinstance(seed, np.random.SeedSequence):
+        seed = np.random.SeedSequence(seed)
+
+    return [int.from_bytes(child.generate_state(4).tobytes(), 'little') for child in seed.spawn(n)]
+
+
 class SlimeModel(Model):
     """Model for simulating slime network formation."""
 
     def __init__(self, width=100, height=100, p_branch=0.075, p_connect=0.1, signal_strength=1,
-                    noise=0.05, food_coords=text_to_coords("tokyo_coords.txt")):
+                    noise=0.05, food_coords=None, chem_cache=True,
+                    engine="agents", seed=None, online_reduction=False, reduce_interval=10, record_file=None):
         """
         Initiate the model.
 
@@ -48,7 +69,18 @@ class SlimeModel(Model):
             p_connect: probability of connecting to a neighbouring SlimeAgent (float)
             signal_strength: Base attraction strength of food source (float)
             noise: Strength of noise in attraction strength (int/float)
-            food_coords: list of (x, y) coordinates to place food sources on (int, int)
+            food_coords: list of (x, y) coordinates to place food sources on (int, int); default None, which reads the
+                         Tokyo map from the package directory.
+            chem_cache: Boolean indicating whether to share the chemical field through the on-disk cache; default True.
+            engine: "agents" to step SlimeAgent objects or "array" to advance the growth front with the array-backed
+                    ArrayEngine (str); default "agents".
+            seed: seed of the random number generator used by all agents, None for a random seed (int).
+            online_reduction: Boolean indicating whether to reduce the network while it grows; default False.
+            reduce_interval: amount of steps between online reductions (int); default 10.
+            record_file: optional path of a file to record the growth of the network in with a GrowthRecorder, which
+                         can be replayed with growth_recorder.GrowthRecording (str). The recording is written in
+                         batches of steps and completed by run(), call close() (or use the model as a context
+                         manager) after advancing the model with step().
         """
         # Initialise model parameters
         super().__init__()
@@ -60,30 +92,82 @@ class SlimeModel(Model):
         self.signal_strength = signal_strength
         self.noise = noise
 
+        # All randomness of the model comes from a single generator, child streams can be spawned from its seed
+        self.seed_sequence = np.random.SeedSequence(seed)
+        self.rng = np.random.default_rng(self.seed_sequence)
+        self.step_draws = iter(())
+
+        if engine not in ("agents", "array"):
+            raise ValueError(f"Unknown engine: {engine}")
+
         # Initialise grid and starting agents
         self.grid = Grid(width, height, torus=False)
         self.schedule = BaseScheduler(self)
         self.running = True
         self.origin = (width // 2, height // 2)
-        slime = SlimeAgent(self.next_id(), self, self.origin, origin=True)
-        self.schedule.add(slime)
-
-        self.grid.place_agent(slime, self.origin)
         self.connections = {self.origin: set()}
+        self.engine = None
+
+        # Edges added since the last recorded step, None when not recording. The agents add their x, y, x, y, cost
+        # values to a flat list, the array engine adds tuples with an x, y, x, y and cost array
+        self.growth_log = None
+
+        # Index of the agent types present on every cell, as bitwise OR of their occupancy flags
+        self.occupancy = np.full((width, height), EMPTY, dtype=np.uint8)
+        self.occupancy[self.origin] |= SlimeAgent.occupancy_flag
+
+        if engine == "array":
+            self.engine = ArrayEngine(self)
+        else:
+            slime = SlimeAgent(self.next_id(), self, self.origin, origin=True)
+            self.schedule.add(slime)
+            self.grid.place_agent(slime, self.origin)
 
         self.food_locations = {}
-        self.chem_values = np.zeros((width, height))
 
-        # Initiate food agents
+        if food_coords is None:
+            food_coords = text_to_coords(TOKYO_COORDS_FILE)
+
+        # Cells whose connections can no longer change, which the online reduction is allowed to remove
+        self.online_reduction = online_reduction
+        self.reduce_interval = reduce_interval
+        self.sealed = np.zeros((width, height), dtype=bool)
+        self.food_set = set(food_coords)
+
+        # Initiate food agents and the chemical environment they create
         for i, coordinate in enumerate(food_coords):
             food = FoodAgent(self.next_id(), self, coordinate)
             self.grid.place_agent(food, coordinate)
+            self.occupancy[coordinate] |= FoodAgent.occupancy_flag
             self.food_locations[i] = coordinate
 
+        if chem_cache:
+            self.chem_values = get_chem_field(width, height, food_coords, signal_strength)
+        else:
+            self.chem_values = compute_chem_field(width, height, food_coords, signal_strength)
+
+        self.recorder = GrowthRecorder(record_file, self) if record_file else None
+
+    def spawn_seeds(self, n):
+        """Returns n seeds for replicate runs, derived from the seed of this model."""
+        return spawn_seeds(self.seed_sequence, n)
+
     def get_connections(self):
         """Returns the dictionary representing the entire network."""
         return self.connections
 
+    def close(self):
+        """Function that completes the recording of the model, if it is recorded, later steps are not recorded."""
+        if self.recorder is not None:
+            self.recorder.close()
+            self.recorder = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
     def run(self, N_steps):
         """
         Main function that runs the model for N steps.
@@ -98,11 +182,28 @@ class SlimeModel(Model):
         for _ in range(N_steps):
             self.step()
 
+        if self.recorder is not None:
+            self.recorder.flush()
+
         return self.connections
 
+    def is_occupied(self, coordinate, agent_type):
+        """
+        Function that checks in O(1) whether an agent type is present on a grid cell using the occupancy index.
+
+        Args:
+            coordinate: tuple of (x, y) coordinates (int, int).
+            agent_type: class of the agent with an occupancy_flag attribute, e.g. SlimeAgent or FoodAgent.
+
+        Returns:
+            Boolean; True if an agent of the specified type is present, False otherwise.
+        """
+        return bool(self.occupancy[coordinate] & agent_type.occupancy_flag)
+
     def divide_neighborhood(self, neighborhood, agent_type):
         """
         Function to divide a neighbourhood into two neighborhoods based on the presence/absence of a specified agent type.
+        Agent types with an occupancy_flag are looked up in the occupancy index, other types are searched on the grid.
 
         Args:
             neighborhood: list of coordinates that make up the neighborhood.
@@ -114,16 +215,97 @@ class SlimeModel(Model):
         """
         empty_cells = []
         occupied_cells = []
+        flag = getattr(agent_type, "occupancy_flag", None)
 
         # check every cell in neighborhood for presence of agent type.
         for cell in neighborhood:
-            agents = self.grid.get_cell_content(cell)
-            if any(isinstance(agent, agent_type) for agent in agents):
+            if flag is not None:
+                present = self.occupancy[cell] & flag
+            else:
+                present = any(isinstance(agent, agent_type) for agent in self.grid.get_cell_content(cell))
+
+            if present:
                 occupied_cells.append(cell)
             else:
                 empty_cells.append(cell)
         return empty_cells, occupied_cells
 
+    def get_front(self):
+        """Returns two arrays with the x and y coordinates of the slime cells that step next."""
+        if self.engine is not None:
+            return self.engine.front_x, self.engine.front_y
+
+        positions = np.array([agent.pos for agent in self.schedule.agents], dtype=int).reshape(-1, 2)
+        return positions[:, 0], positions[:, 1]
+
+    def reduce_sealed_nodes(self):
+        """
+        Function that reduces the part of the network that can no longer grow.
+        A slime cell is sealed once it has stepped and none of its neighbouring cells is empty or about to step, so no
+        slime cell will ever connect to it again. Newly sealed cells are reduced like reduce_graph does, where unsealed
+        cells and food locations are protected, so dead ends and twofold connected chains are removed as soon as they
+        stop growing.
+
+        Cells are sealed in a different order than reduce_graph visits them, so two parallel chains between the same
+        cells can be merged in a different order. Where reduce_graph keeps the chain that is merged first, the online
+        reduction keeps the cheapest one, so its result does not depend on when cells are sealed. Reduced further by
+        reduce_graph, the network has the same nodes and edges as the offline reduction, and with keep_cheapest=True
+        it also has the same costs.
+        """
+        front_x, front_y = self.get_front()
+        is_open = (self.occupancy & SLIME) == 0
+        is_open[front_x, front_y] = True
+
+        # A cell is closed when neither it nor any of its neighbours is open, cells outside of the grid are closed
+        padded = np.zeros((self.width + 2, self.height + 2), dtype=bool)
+        padded[1:-1, 1:-1] = is_open
+        near_open = is_open.copy()
+
+        for dx in (0, 1, 2):
+            for dy in (0, 1, 2):
+                near_open |= padded[dx:dx + self.width, dy:dy + self.height]
+
+        newly_sealed = ~near_open & ~self.sealed
+        self.sealed |= ~near_open
+
+        x, y = np.nonzero(newly_sealed)
+        candidates = [node for node in zip(x.tolist(), y.tolist()) if node in self.connections]
+
+        if candidates:
+            rank = dict(zip(self.connections, range(len(self.connections))))
+            candidates.sort(key=rank.__getitem__)
+
+            reduce_nodes(self.connections, candidates,
+                         lambda node: node in self.food_set or not self.sealed[node], rank,
+                         keep_cheapest=True)
+
+    def draw_step_random_numbers(self):
+        """
+        Function that draws the random numbers of all slime agents that step this step in one call per kind.
+        Every agent takes its (branch, connect, choice, noise) draws from the step_draws iterator in schedule order,
+        where noise holds a value for each of the (at most 8) cells in its neighborhood.
+        """
+        n = self.schedule.get_agent_count()
+
+        self.step_draws = zip(self.rng.uniform(size=n).tolist(), self.rng.uniform(size=n).tolist(),
+                              self.rng.uniform(size=n).tolist(), self.rng.normal(0, self.noise, size=(n, 8)).tolist())
+
+    def draw_agent_random_numbers(self):
+        """Returns the (branch, connect, choice, noise) draws of a single slime agent, like draw_step_random_numbers."""
+        return (self.rng.uniform(), self.rng.uniform(), self.rng.uniform(),
+                self.rng.normal(0, self.noise, size=8).tolist())
+
     def step(self):
         """Advances the model by one step."""
+        if self.engine is not None:
+            self.engine.step()
+        else:
+            self.draw_step_random_numbers()
+
         self.schedule.step()
+
+        if self.recorder is not None:
+            self.recorder.record_step(self.schedule.steps)
+
+        if self.online_reduction and self.schedule.steps % self.reduce_interval == 0:
+            self.reduce_sealed_nodes()
@@ -0,0 +1,137 @@
+from itertools import chain
+import os
+import struct
+import zlib
+import numpy as np
+
+# Colors of the image, the same as the figures of run.plot_result
+BACKGROUND_COLOR = (255, 255, 255)
+EDGE_COLOR = (255, 242, 0)
+NODE_COLOR = (213, 184, 90)
+FOOD_COLOR = (255, 0, 0)
+
+
+def rasterize_lines(starts, ends):
+    """
+    Function that finds the pixels covered by straight lines between grid points with a DDA line algorithm,
+    vectorized over all lines at once.
+
+    Args:
+        starts: NumPy array of shape (m, 2) with the (x, y) pixel of the start of every line.
+        ends: NumPy array of shape (m, 2) with the (x, y) pixel of the end of every line.
+
+    Returns:
+        NumPy array of shape (pixels, 2) with the (x, y) coordinates of all covered pixels.
+    """
+    starts = np.asarray(starts, dtype=float).reshape(-1, 2)
+    ends = np.asarray(ends, dtype=float).reshape(-1, 2)
+
+    # Sample every line once per pixel along its longest axis
+    steps = np.abs(ends - starts).max(axis=1).astype(np.int64)
+    line = np.repeat(np.arange(len(steps)), steps + 1)
+    offsets = np.cumsum(steps + 1) - (steps + 1)
+    t = (np.arange(len(line)) - offsets[line]) / np.maximum(steps[line], 1)
+
+    return np.rint(starts[line] + t[:, None] * (ends[line] - starts[line])).astype(np.int64)
+
+
+def to_coordinate_array(coords):
+    """Converts a collection of (x, y) coordinate tuples to a NumPy array of shape (n, 2) without per-tuple copies."""
+    return np.fromiter(chain.from_iterable(coords), dtype=np.int64, count=2 * len(coords)).reshape(-1, 2)
+
+
+def render_network(connections, food_coords, width, height, scale=1):
+    """
+    Function that draws a network straight into an RGB array, with one pixel per grid cell (or scale x scale pixels).
+
+    Args:
+        connections: dictionary containing (x, y) coordinate tuples as keys and sets of ((x, y), cost) tuples as
+                     values representing connected coordinates.
+        food_coords: list of (x, y) coordinates of the food sources.
+        width: width of the grid.
+        height: height of the grid.
+        scale: amount of pixels per grid cell along each axis.
+
+    Returns:
+        NumPy uint8 array of shape (height * scale, width * scale, 3), with y pointing up like in the plots.
+    """
+    image = np.empty((height * scale, width * scale, 3), dtype=np.uint8)
+    image[:] = BACKGROUND_COLOR
+
+    def draw(pixels, color):
+        """Colors the (x, y) pixels, flipping y so the origin is in the bottom left corner."""
+        pixels = np.asarray(pixels, dtype=np.int64).reshape(-1, 2)
+        image[height * scale - 1 - pixels[:, 1], pixels[:, 0]] = color
+
+    nodes = to_coordinate_array(connections)
+    ends = to_coordinate_array([next_node for links in connections.values() for next_node, _ in links])
+    starts = np.repeat(nodes, np.fromiter(map(len, connections.values()), dtype=np.int64, count=len(nodes)), axis=0)
+
+    # Edges between neighbouring cells only cover the pixels of their nodes if a cell is one pixel
+    if scale == 1:
+        long_edges = np.abs(ends - starts).max(axis=1) > 1
+        starts, ends = starts[long_edges], ends[long_edges]
+
+    # Draw the edges (in both directions, which covers the same pixels) between the centers of the cells
+    draw(rasterize_lines(starts * scale + scale // 2, ends * scale + scale // 2), EDGE_COLOR)
+
+    block = np.stack(np.meshgrid(np.arange(scale), np.arange(scale)), axis=-1).reshape(-1, 2)
+
+    for cells, color in [(nodes, NODE_COLOR), (to_coordinate_array(food_coords), FOOD_COLOR)]:
+        draw((cells[:, None] * scale + block[None]).reshape(-1, 2), color)
+
+    return image
+
+
+def write_png(path, image):
+    """
+    Function that writes an RGB array as an (8 bit, zlib compressed) PNG file.
+
+    Args:
+        path: path of the PNG file.
+        image: NumPy uint8 array of shape (height, width, 3).
+    """
+    height, width, _ = image.shape
+
+    def chunk(kind, data):
+        """Returns a PNG chunk with its length and checksum."""
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+
+    # Every row starts with filter type 0 (no filter)
+    rows = np.zeros((height, width * 3 + 1), dtype=np.uint8)
+    rows[:, 1:] = np.ascontiguousarray(image, dtype=np.uint8).reshape(height, -1)
+
+    with open(path, "wb") as fp:
+        fp.write(b"\x89PNG\r\n\x1a\n")
+        fp.write(chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)))
+        fp.write(chunk(b"IDAT", zlib.compress(rows.tobytes(), 1)))
+        fp.write(chunk(b"IEND", b""))
+
+
+def save_network_image(path, connections, food_coords, width, height, scale=1):
+    """Draws a network with render_network and writes it to a PNG file."""
+    write_png(path, render_network(connections, food_coords, width, height, scale))
+
+
+def save_network_images(directory, networks, width, height, scale=1):
+    """
+    Function that writes the images of many networks to a directory.
+
+    Args:
+        directory: directory of the PNG files, created if it does not exist.
+        networks: iterable of (name, connections, food_coords) tuples, every network is stored as <name>.png.
+        width: width of the grid.
+        height: height of the grid.
+        scale: amount of pixels per grid cell along each axis.
+
+    Returns:
+        list of the paths of the written files.
+    """
+    os.makedirs(directory, exist_ok=True)
+    paths = []
+
+    for name, connections, food_coords in networks:
+        paths.append(os.path.join(directory, f"{name}.png"))
+        save_network_image(paths[-1], connections, food_coords, width, height, scale)
+
+    return paths
@@ -1,9 +1,13 @@
 import csv
+import os
 import numpy as np
-import networkx as nx
-import utm
 import re
 
+# Rail network csv files of the cities, and their pre-parsed stations and rail edges which are invalidated when the
+# csv files change
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".geo_cache")
+
 
 def coord_to_grid_coord(coord, hor_n, ver_n):
     """Takes a values between 0 and 1 and maps it to a grid coordinate
@@ -16,61 +20,120 @@ def coord_to_grid_coord(coord, hor_n, ver_n):
     Returns:
         tuple(): new coordinate containing index of the corresponding cell
     """
-    x, y = coord
-
-    x_index = np.ceil(hor_n * x)
-    y_index = np.ceil(ver_n * y)
+    (x_index, y_index), = coords_to_grid_indices([coord[0]], [coord[1]], hor_n, ver_n).tolist()
 
-    if x_index >= hor_n:
-        x_index = hor_n - 1
+    return (x_index, y_index)
 
-    if y_index >= ver_n:
-        y_index = ver_n - 1
 
-    return (int(x_index), int(y_index))
+def coords_to_grid_indices(x_vals, y_vals, hor_n, ver_n):
+    """Maps arrays of values between 0 and 1 to grid coordinates
 
+    Args:
+        x_vals (np.ndarray): relative x coordinates
+        y_vals (np.ndarray): relative y coordinates
+        hor_n (int): amount of columns
+        ver_n (int): amount of rows
 
-def coords_to_grid_indices(coords, hor_n, ver_n):
-    """Applies the function coord_to_grid_coord to a dictionary
+    Returns:
+        np.ndarray: array of shape (n, 2) containing the index of the corresponding cell of every coordinate
     """
-    grid_indices = {}
+    x_indices = np.minimum(np.ceil(hor_n * np.asarray(x_vals, dtype=float)), hor_n - 1)
+    y_indices = np.minimum(np.ceil(ver_n * np.asarray(y_vals, dtype=float)), ver_n - 1)
 
-    for node_id in coords:
-        x, y = coords[node_id]
+    return np.stack([x_indices, y_indices], axis=-1).astype(int)
 
-        grid_indices[node_id] = coord_to_grid_coord((x, y), hor_n, ver_n)
 
-    return grid_indices
+def convert_geo_to_relative_coords(latitudes, longitudes):
+    """Projects arrays of geo-coordinates to 2D space and maps them to
+    numbers between 0 and 1.
+
+    Returns:
+        tuple(np.ndarray): relative x and y coordinates
+    """
+    return scale_coords(*project_utm(latitudes, longitudes))
 
 
-def convert_geo_to_relative_coords(geo_coords):
-    """Takes a dictionary of node ids to geo-coordinates and maps them to
+def scale_coords(x_vals, y_vals):
+    """Scales and translates arrays of projected coordinates to
     numbers between 0 and 1.
+
+    Returns:
+        tuple(np.ndarray): relative x and y coordinates
+    """
+    x_vals = np.asarray(x_vals, dtype=float)
+    y_vals = np.asarray(y_vals, dtype=float)
+
+    return ((x_vals - x_vals.min()) / (x_vals.max() - x_vals.min()),
+            (y_vals - y_vals.min()) / (y_vals.max() - y_vals.min()))
+
+
+def merge_duplicate_cells(grid_coords):
+    """Merges coordinates that fall into the same grid cell
+
+    Args:
+        grid_coords (np.ndarray): array of shape (n, 2) with grid coordinates
+
+    Returns:
+        np.ndarray: the distinct grid coordinates in order of first appearance
+        np.ndarray: amount of coordinates that were merged into every cell
     """
-    station_locations = {}
+    grid_coords = np.asarray(grid_coords).reshape(-1, 2)
+    cells, first, counts = np.unique(grid_coords, axis=0, return_index=True, return_counts=True)
+    order = np.argsort(first)
+
+    return cells[order], counts[order]
 
-    # Convert coordinates to 2D space coordinates
-    for i in range(len(geo_coords)):
-        station_id = list(geo_coords.keys())[i]
-        latitude, longitude = geo_coords[station_id]
-        x, y, _, _ = utm.from_latlon(latitude, longitude)
 
-        station_locations[station_id] = (x, y)
+def get_utm_zone_numbers(latitudes, longitudes):
+    """Vectorized version of utm.latlon_to_zone_number
 
-    # Scale and translate 2D coordinates
-    x_vals = [x for (x, _) in station_locations.values()]
-    y_vals = [y for (_, y) in station_locations.values()]
+    Args:
+        latitudes (np.ndarray): latitudes in degrees
+        longitudes (np.ndarray): longitudes in degrees
+
+    Returns:
+        np.ndarray: UTM zone number of every coordinate
+    """
+    longitudes = (longitudes % 360 + 540) % 360 - 180
+    zones = ((longitudes + 180) / 6).astype(int) + 1
 
-    for i in range(len(geo_coords)):
-        node_id = list(station_locations.keys())[i]
-        x, y = station_locations[node_id]
+    # Special zone for Norway
+    zones[(56 <= latitudes) & (latitudes < 64) & (3 <= longitudes) & (longitudes < 12)] = 32
 
-        x_new = (x - np.min(x_vals)) / (np.max(x_vals) - np.min(x_vals))
-        y_new = (y - np.min(y_vals)) / (np.max(y_vals) - np.min(y_vals))
+    # Special zones for Svalbard
+    svalbard = (72 <= latitudes) & (latitudes <= 84) & (longitudes >= 0) & (longitudes < 42)
+    zones[svalbard] = np.array([31, 33, 35, 37])[np.searchsorted([9, 21, 33], longitudes[svalbard], side="right")]
 
-        station_locations[node_id] = (x_new, y_new)
+    return zones
+
+
+def project_utm(latitudes, longitudes):
+    """Projects geo-coordinates to UTM coordinates with array operations,
+    every coordinate is projected in its own zone like utm.from_latlon does for a single coordinate.
+
+    Args:
+        latitudes (np.ndarray): latitudes in degrees
+        longitudes (np.ndarray): longitudes in degrees
+
+    Returns:
+        tuple(np.ndarray): easting and northing of every coordinate
+    """
+    import utm
 
-    return station_locations
+    latitudes = np.asarray(latitudes, dtype=float)
+    longitudes = np.asarray(longitudes, dtype=float)
+    x_vals = np.zeros(len(latitudes))
+    y_vals = np.zeros(len(latitudes))
+
+    zones = get_utm_zone_numbers(latitudes, longitudes)
+    northern = latitudes >= 0
+
+    for zone, is_northern in set(zip(zones.tolist(), northern.tolist())):
+        group = (zones == zone) & (northern == is_northern)
+        x_vals[group], y_vals[group], _, _ = utm.from_latlon(latitudes[group], longitudes[group],
+                                                             force_zone_number=zone, force_northern=is_northern)
+
+    return x_vals, y_vals
 
 
 def read_nodes(filename):
@@ -112,6 +175,8 @@ def read_edges(filename):
 
 
 def create_graph(node_coords, edges):
+    import networkx as nx
+
     G = nx.Graph()
 
     for edge in edges:
@@ -124,16 +189,107 @@ def create_graph(node_coords, edges):
     return G
 
 
-def get_city_grid(city, hor_N, ver_N):
-    node_coords = read_nodes(f"data/{city}/network_nodes.csv")
-    edges = read_edges(f"data/{city}/network_rail.csv")
-    graph = create_graph(node_coords, edges)
+def get_source_files(city):
+    """Returns the paths of the node and rail edge files of a city"""
+    return [os.path.join(DATA_DIR, city, "network_nodes.csv"), os.path.join(DATA_DIR, city, "network_rail.csv")]
 
-    nodes_to_plot = {}
 
-    for node in graph.nodes:
-        nodes_to_plot[node] = node_coords[node]
+def get_source_stamps(files):
+    """Returns the modification times and sizes of files, which invalidate the cache when they change"""
+    return np.array([[os.stat(file).st_mtime_ns, os.stat(file).st_size] for file in files], dtype=np.int64)
+
+
+def preprocess_city(city, cache_dir=CACHE_DIR):
+    """Parses the csv files of a city once and stores the stations of its rail network
+    with their projected coordinates in a binary cache file.
+
+    Args:
+        city (str): name of the city directory in data/
+        cache_dir (str): directory of the cache files
 
-    relative_coords = convert_geo_to_relative_coords(nodes_to_plot)
+    Returns:
+        dict: arrays of the cached city, see load_city
+    """
+    nodes_file, edges_file = get_source_files(city)
+    node_coords = read_nodes(nodes_file)
+    edges = read_edges(edges_file)
+
+    # Stations in the order they appear in the rail network (the node order of create_graph)
+    node_ids = np.array(list(dict.fromkeys(node for edge in edges for node in edge)), dtype=np.int64)
+    latitudes, longitudes = np.array([node_coords[node] for node in node_ids.tolist()], dtype=float).reshape(-1, 2).T
+    x_vals, y_vals = project_utm(latitudes, longitudes)
+
+    data = {
+        "node_ids": node_ids,
+        "x": x_vals,
+        "y": y_vals,
+        "edges": np.array(list(edges), dtype=np.int64).reshape(-1, 2),
+        "distances": np.array(list(edges.values()), dtype=np.int64),
+        "sources": np.array([os.path.abspath(file) for file in (nodes_file, edges_file)]),
+        "stamps": get_source_stamps([nodes_file, edges_file]),
+    }
+
+    os.makedirs(cache_dir, exist_ok=True)
+    path = os.path.join(cache_dir, f"{city}.npz")
+    tmp_path = f"{path}.{os.getpid()}.tmp.npz"
+    np.savez(tmp_path, **data)
+    os.replace(tmp_path, path)
+
+    return data
+
+
+def load_city(city, cache_dir=CACHE_DIR):
+    """Loads the rail network of a city from the cache, and (re)builds the cache if it is missing
+    or if the csv files have changed since it was built.
+
+    Args:
+        city (str): name of the city directory in data/
+        cache_dir (str): directory of the cache files
+
+    Returns:
+        dict: NumPy arrays "node_ids", "x" and "y" (projected coordinates) of the stations in the rail network,
+            "edges" (pairs of node ids) and "distances" of the rail edges
+    """
+    files = get_source_files(city)
+    path = os.path.join(cache_dir, f"{city}.npz")
 
-    return list(coords_to_grid_indices(relative_coords, hor_N, ver_N).values())
+    if os.path.exists(path):
+        with np.load(path) as cache:
+            data = {name: cache[name] for name in cache.files}
+
+        if (data["sources"].tolist() == [os.path.abspath(file) for file in files] and
+                np.array_equal(data["stamps"], get_source_stamps(files))):
+            return data
+
+    return preprocess_city(city, cache_dir)
+
+
+def get_city_grid(city, hor_N, ver_N, merge_duplicates=True):
+    """Maps the stations of the rail network of a city to the cells of a grid
+
+    Args:
+        city (str): name of the city directory in data/
+        hor_N (int): amount of columns
+        ver_N (int): amount of rows
+        merge_duplicates (bool): place one food source in a cell that contains multiple stations,
+            otherwise the cell is listed once per station
+
+    Returns:
+        list(tuple): grid coordinates of the food sources
+    """
+    city_data = load_city(city)
+    grid_coords = coords_to_grid_indices(*scale_coords(city_data["x"], city_data["y"]), hor_N, ver_N)
+
+    if merge_duplicates:
+        grid_coords, _ = merge_duplicate_cells(grid_coords)
+
+    return [tuple(coord) for coord in grid_coords.tolist()]
+
+
+if __name__ == "__main__":
+    """Builds the cache of every city in data/
+    python read_geo_data.py
+    """
+    for city in sorted(os.listdir(DATA_DIR)):
+        city_data = preprocess_city(city)
+        print(f"{city}: {len(city_data['node_ids'])} stations, {len(city_data['edges'])} rail edges")
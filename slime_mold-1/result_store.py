@@ -0,0 +1,156 @@
+import json
+import os
+import numpy as np
+
+# Every result file starts with the magic bytes, the length of the JSON header and the header itself
+MAGIC = b"SLIMERES"
+HEADER_LENGTH_BYTES = 8
+
+# One fixed size record per finished simulation
+RECORD_DTYPE = np.dtype([
+    ("run", "<i4"),
+    ("index", "<i4"),
+    ("p_branch", "<f8"),
+    ("p_connect", "<f8"),
+    ("signal_strength", "<f8"),
+    ("noise", "<f8"),
+    ("seed", "S40"),
+    ("path_length", "<f8"),
+    ("degree", "<f8"),
+    ("betweenness", "<f8"),
+    ("duration", "<f8"),
+])
+METRICS = ["path_length", "degree", "betweenness"]
+
+
+class ResultStore:
+    """
+    Append-only file with the results of an experiment.
+    The file holds a JSON header with the settings of the experiment followed by one record per simulation, which is
+    written as soon as the simulation finishes. The records are read back as a memory-mapped structured array, so a
+    running or crashed experiment can be inspected and resumed.
+    """
+    def __init__(self, path):
+        """
+        Open an existing result file.
+
+        Args:
+            path: path of the result file.
+        """
+        self.path = path
+
+        with open(path, "rb") as fp:
+            if fp.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f"{path} is not a result file")
+
+            length = int.from_bytes(fp.read(HEADER_LENGTH_BYTES), "little")
+            self.metadata = json.loads(fp.read(length).decode())
+
+        self.offset = len(MAGIC) + HEADER_LENGTH_BYTES + length
+
+    @classmethod
+    def create(cls, path, metadata):
+        """
+        Function that creates a new result file, replacing any existing file.
+
+        Args:
+            path: path of the result file.
+            metadata: JSON serializable dictionary with the settings of the experiment.
+
+        Returns:
+            ResultStore object.
+        """
+        header = json.dumps(metadata).encode()
+
+        with open(path, "wb") as fp:
+            fp.write(MAGIC + len(header).to_bytes(HEADER_LENGTH_BYTES, "little") + header)
+
+        return cls(path)
+
+    @classmethod
+    def open_or_create(cls, path, metadata):
+        """
+        Function that opens a result file to resume its experiment, or creates it if it does not exist yet.
+
+        Args:
+            path: path of the result file.
+            metadata: JSON serializable dictionary with the settings of the experiment.
+
+        Returns:
+            ResultStore object.
+
+        Raises:
+            ValueError: if the file belongs to an experiment with different settings.
+        """
+        if not os.path.exists(path):
+            return cls.create(path, metadata)
+
+        store = cls(path)
+
+        if store.metadata != json.loads(json.dumps(metadata)):
+            raise ValueError(f"{path} contains an experiment with different settings, remove it to start over")
+
+        store.truncate()
+
+        return store
+
+    def __len__(self):
+        """Amount of complete records in the file."""
+        return (os.path.getsize(self.path) - self.offset) // RECORD_DTYPE.itemsize
+
+    def truncate(self):
+        """Removes a partly written record at the end of the file, left behind by an interrupted write."""
+        size = self.offset + len(self) * RECORD_DTYPE.itemsize
+
+        if os.path.getsize(self.path) != size:
+            with open(self.path, "r+b") as fp:
+                fp.truncate(size)
+
+    def append(self, **values):
+        """
+        Function that writes the record of a finished simulation to the end of the file.
+
+        Args:
+            values: value of every field of RECORD_DTYPE.
+        """
+        record = np.zeros(1, dtype=RECORD_DTYPE)
+
+        for name, value in values.items():
+            record[name] = str(value).encode() if name == "seed" else value
+
+        with open(self.path, "ab") as fp:
+            fp.write(record.tobytes())
+            fp.flush()
+            os.fsync(fp.fileno())
+
+    def records(self):
+        """Returns a read-only memory-mapped structured array of all complete records."""
+        if len(self) == 0:
+            return np.zeros(0, dtype=RECORD_DTYPE)
+
+        return np.memmap(self.path, dtype=RECORD_DTYPE, mode="r", offset=self.offset, shape=(len(self),))
+
+    def completed(self):
+        """Returns the set of (run, index) keys of the finished simulations."""
+        records = self.records()
+
+        return set(zip(records["run"].tolist(), records["index"].tolist()))
+
+    def get_results(self, n_runs, resolution):
+        """
+        Function that arranges the metrics of the records by run and parameter index.
+
+        Args:
+            n_runs: amount of runs of the experiment.
+            resolution: amount of parameter values of the experiment.
+
+        Returns:
+            results: NumPy array of shape (n_runs, metrics, resolution), NaN for unfinished simulations.
+        """
+        records = self.records()
+        results = np.full((n_runs, len(METRICS), resolution), np.nan)
+
+        for m, metric in enumerate(METRICS):
+            results[records["run"], m, records["index"]] = records[metric]
+
+        return results
@@ -1,4 +1,6 @@
+import argparse
 import matplotlib.pyplot as plt
+from matplotlib.collections import LineCollection
 from agents import *
 from helpers import reduce_graph, text_to_coords
 from model import *
@@ -7,70 +9,74 @@ from analyze_graph import *
 from read_geo_data import get_city_grid
 
 
-def plot_result(graph, shortest_paths=None, show_all=True):
-    fig = plt.figure(dpi=200, figsize=(3, 3))
+def plot_result(graph, food_coords, shortest_paths=None, show_all=True, filename="graph.png", show=True):
+    """Draws the network of a simulation with one artist per kind of edge and node.
 
-    # Keep track of plotted objects to improve performance
-    plotted_edges = set()
-    plotted_nodes = set()
+    Args:
+        graph: dictionary containing (x, y) coordinate tuples as keys and sets of ((x, y), cost) tuples as values
+        food_coords: list of (x, y) coordinates of the food sources
+        shortest_paths: optional dictionary with the shortest paths between food sources, which are highlighted
+        show_all: also draw the edges and nodes that are not on a shortest path
+        filename: file to save the figure in, not saved if None
+        show: open a window with the figure, use False to run headless
 
-    if shortest_paths:
-        shortest_path_nodes = set()
-
-        # Plot the shortest paths between the food sources
-        for path_key in shortest_paths:
-            path = shortest_paths[path_key]
-
-            for i in range(len(path) - 1):
-                (x0, y0) = path[i]
-                (x1, y1) = path[i + 1]
-                edge_key = frozenset([(x0, y0), (x1, y1)])
+    Returns:
+        matplotlib.figure.Figure: the figure
+    """
+    fig, ax = plt.subplots(dpi=200, figsize=(3, 3))
 
-                shortest_path_nodes.add((x0, y0))
-                shortest_path_nodes.add((x1, y1))
+    path_edges = set()
+    path_nodes = set()
 
-                if edge_key not in plotted_edges:
-                    plt.plot([x0, x1], [y0, y1], color=(1, 0, 0, 1), lw=.4)
-
-                    plotted_edges.add(edge_key)
+    # Plot the shortest paths between the food sources
+    if shortest_paths:
+        for path in shortest_paths.values():
+            if path:
+                path_edges.update(frozenset(edge) for edge in zip(path, path[1:]))
+                path_nodes.update(path)
 
-        for node in shortest_path_nodes:
-            if node not in plotted_nodes:
-                plt.scatter(node[0], node[1], color=(.7, 0, 0, 1), s=.5, zorder=5)
+        ax.add_collection(LineCollection([tuple(edge) for edge in path_edges], colors=[(1, 0, 0, 1)], linewidths=.4))
 
-                plotted_nodes.add(node)
+        if path_nodes:
+            ax.scatter(*zip(*path_nodes), color=(.7, 0, 0, 1), s=.5, zorder=5)
 
-    # Plot all connections
+    # Plot all connections and intermediate nodes
     if show_all:
-        for node, links in graph.items():
-            x0, y0 = node
+        edges = {frozenset([node, next_node]) for node, links in graph.items()
+                 for next_node, _ in links} - path_edges
+        ax.add_collection(LineCollection([tuple(edge) for edge in edges], colors=[(255/255, 242/255, 0, 1)],
+                                         linewidths=.5, zorder=-1))
 
-            for connected_coordinate, _ in links:
-                edge_key = frozenset([node, connected_coordinate])
+        nodes = [node for node in graph if node not in path_nodes]
 
-                if edge_key not in plotted_edges:
-                    x, y = connected_coordinate
-                    plt.plot([x0, x], [y0, y], color=(255/255, 242/255, 0, 1), lw=.5, zorder=-1)
+        if nodes:
+            ax.scatter(*zip(*nodes), color=(213/255, 184/255, 90/255, 1), s=.5)
 
-                    plotted_edges.add(edge_key)
+    # Plot food nodes
+    ax.scatter(*zip(*food_coords), color='red', marker='s', s=3, zorder=100)
+    ax.autoscale_view()
 
-        # Plot intermediate nodes
-        for node in graph.keys():
-            if node not in plotted_nodes:
-                plt.scatter(node[0], node[1], color=(213/255, 184/255, 90/255, 1), s=.5)
+    if filename:
+        fig.savefig(filename)
 
-                plotted_nodes.add(node)
+    if show:
+        plt.show()
 
-    # Plot food nodes
-    x, y = zip(*model.food_locations.values())
-    plt.scatter(x, y, color='red', marker='s', s=3, zorder=100)
+    return fig
 
-    plt.savefig("graph.png")
 
-    plt.show()
+if __name__ == "__main__":
+    """Options to run:
+    python run.py [--headless] [--output <file to save the figure in>]
+    """
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--headless", action="store_true", help="only save the figure without opening a window")
+    parser.add_argument("--output", default="graph.png", help="file to save the figure in")
+    args = parser.parse_args()
 
+    if args.headless:
+        plt.switch_backend("Agg")
 
-if __name__ == "__main__":
     N_steps = 200                   # 200 default
     size = 100                      # 100 default
     p_branch = 0.075                # 0.075 default
@@ -88,4 +94,5 @@ if __name__ == "__main__":
     graph = reduce_graph(graph, food_coords)
     shortest_paths = get_all_shortest_paths(graph, food_coords)
 
-    plot_result(graph, shortest_paths, show_all=True)
+    plot_result(graph, list(model.food_locations.values()), shortest_paths, show_all=True, filename=args.output,
+                show=not args.headless)
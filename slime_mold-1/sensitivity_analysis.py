@@ -1,15 +1,12 @@
-from IPython.display import clear_output
-import SALib
-from SALib.sample import saltelli
 from model import SlimeModel
 from agents import SlimeAgent, FoodAgent
 from analyze_graph import *
-from mesa.batchrunner import BatchRunner
-from SALib.analyze import sobol
-import pandas as pd
+from network_image import save_network_image
 import numpy as np
-import matplotlib.pyplot as plt
 from itertools import combinations
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import argparse
+import os
 import time
 
 
@@ -46,6 +43,8 @@ def plot_all_vars(df, param, problem):
         param: the parameter to be plotted
     """
 
+    import matplotlib.pyplot as plt
+
     f, axs = plt.subplots(4, figsize=(7, 10))
     f.set_tight_layout(True)
 
@@ -55,12 +54,144 @@ def plot_all_vars(df, param, problem):
     f.savefig(param)
 
 def do_plots(params, data, problem):
+    import matplotlib.pyplot as plt
+
     for param in params:
         plot_all_vars(data, param, problem)
         plt.show()
 
 
-def OFAT():
+def get_graph_size(model):
+    """Returns the total cost of the edges in the reduced network of a model that has been run."""
+    food_coords = list(model.food_locations.values())
+
+    return CSRGraph.from_connections(reduce_graph(model.get_connections(), food_coords)).size(weight=True)
+
+
+def run_samples(names, samples, max_steps, seeds, image_files=None):
+    """
+    Runs the model once for every parameter sample.
+
+    Args:
+        names: names of the varied model parameters.
+        samples: array with a row of parameter values per run.
+        max_steps: amount of steps to run the model.
+        seeds: seed of every run.
+        image_files: optional PNG file per run to draw the resulting network in.
+
+    Returns:
+        NumPy array with the graph size of every run.
+    """
+    results = np.zeros(len(samples))
+
+    # Samples that vary the signal strength all have a different field, so don't fill the cache with them
+    chem_cache = 'signal_strength' not in names
+
+    for i, (values, seed) in enumerate(zip(samples, seeds)):
+        model = SlimeModel(**dict(zip(names, values)), chem_cache=chem_cache, seed=seed)
+        model.run(max_steps)
+
+        # Draw the network before get_graph_size reduces the connections of the model in place
+        if image_files is not None:
+            save_network_image(image_files[i], model.get_connections(), list(model.food_locations.values()),
+                               model.width, model.height)
+
+        results[i] = get_graph_size(model)
+
+    return results
+
+
+def save_checkpoint(checkpoint, param_values, output, seed):
+    """
+    Writes the evaluated outputs to the checkpoint file, replacing it at once so a crash cannot corrupt it. The seed
+    is stored as a string, since a 128-bit seed of SeedSequence would otherwise need a pickled object array.
+    """
+    tmp_file = checkpoint + ".tmp.npz"
+    np.savez(tmp_file, param_values=param_values, output=output, seed=str(seed))
+    os.replace(tmp_file, checkpoint)
+
+
+def evaluate_samples(names, param_values, replicates, max_steps, workers=1, chunk_size=16, checkpoint=None,
+                     seed=None, image_dir=None):
+    """
+    Evaluates every parameter sample <replicates> times, spreading chunks of runs over a pool of processes.
+
+    Args:
+        names: names of the varied model parameters.
+        param_values: array with a row of parameter values per sample.
+        replicates: amount of runs per sample.
+        max_steps: amount of steps to run the model.
+        workers: amount of processes, 1 runs everything in this process.
+        chunk_size: amount of runs per job.
+        checkpoint: optional .npz file to which the results are written after every chunk, an existing checkpoint
+            of the same samples is resumed.
+        seed: seed from which the seed of every run is derived (ignored when resuming).
+        image_dir: optional directory to store an image of the network of every run in, as
+            sample<sample>_rep<replicate>.png.
+
+    Returns:
+        NumPy array of shape (replicates, samples) with the graph size of every run.
+    """
+    param_values = np.asarray(param_values, dtype=float)
+    n_samples = len(param_values)
+    output = np.full(replicates * n_samples, np.nan)
+
+    if seed is None:
+        seed = np.random.SeedSequence().entropy
+
+    if checkpoint and os.path.exists(checkpoint):
+        with np.load(checkpoint) as data:
+            if not np.array_equal(data['param_values'], param_values) or data['output'].size != output.size:
+                raise ValueError(f"Checkpoint {checkpoint} belongs to a different experiment")
+
+            output[:] = data['output']
+            seed = int(data['seed'].item())
+
+    # Run j evaluates sample j % n_samples for replicate j // n_samples
+    pending = np.flatnonzero(np.isnan(output))
+    chunks = [pending[i:i + chunk_size] for i in range(0, len(pending), chunk_size)]
+    jobs = [(names, param_values[chunk % n_samples], max_steps,
+             [get_job_seed(seed, j // n_samples, j % n_samples) for j in chunk],
+             image_dir and [os.path.join(image_dir, f"sample{j % n_samples}_rep{j // n_samples}.png") for j in chunk])
+            for chunk in chunks]
+
+    if image_dir:
+        os.makedirs(image_dir, exist_ok=True)
+
+    start = time.time()
+    n_done = 0
+
+    def collect(chunk, results):
+        """Stores the results of a chunk and displays progress."""
+        nonlocal n_done
+
+        output[chunk] = results
+        n_done += len(chunk)
+
+        if checkpoint:
+            save_checkpoint(checkpoint, param_values, output, seed)
+
+        elapsed = time.time() - start
+        print(f'{100 * (output.size - len(pending) + n_done) / output.size:.2f}% done, '
+              f'{n_done / elapsed:.2f} iterations / second')
+
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = {executor.submit(run_samples, *job): chunk for job, chunk in zip(jobs, chunks)}
+
+            for future in as_completed(futures):
+                collect(futures[future], future.result())
+    else:
+        for job, chunk in zip(jobs, chunks):
+            collect(chunk, run_samples(*job))
+
+    return output.reshape(replicates, n_samples)
+
+
+def OFAT(replicates=2, max_steps=200, distinct_samples=2, workers=1):
+    import matplotlib.pyplot as plt
+    import pandas as pd
+
     # We define our variables and bounds
     problem = {
         'num_vars': 4,
@@ -68,31 +199,14 @@ def OFAT():
         'bounds': [[0.01, 0.1], [0.01, 0.1], [10, 11], [0.75, 1]]
     }
 
-    # Set the repetitions, the amount of steps, and the amount of distinct values per variable
-    replicates = 2
-    max_steps = 200
-    distinct_samples = 2
-
-    # Set the outputs
-    food_coords = text_to_coords("tokyo_coords.txt")
-    model_reporters = {"Graph size": lambda m: convert_result_to_graph(reduce_graph(m.get_connections(), food_coords)).size(weight="weight")}
-
     data = {}
 
     for i, var in enumerate(problem['names']):
         # Get the bounds for this variable and get <distinct_samples> samples within this space (uniform)
         samples = np.linspace(*problem['bounds'][i], num=distinct_samples)
+        output = evaluate_samples([var], samples[:, None], replicates, max_steps, workers=workers)
 
-        batch = BatchRunner(SlimeModel,
-                            max_steps=max_steps,
-                            iterations=replicates,
-                            variable_parameters={var: samples},
-                            model_reporters=model_reporters,
-                            display_progress=True)
-
-        batch.run_all()
-
-        data[var] = batch.get_model_vars_dataframe()
+        data[var] = pd.DataFrame({var: np.tile(samples, replicates), "Graph size": output.ravel()})
 
     do_plots(["Graph size"], data, problem)
     plt.show()
@@ -110,6 +224,7 @@ def plot_index(s, params, i, title=''):
         i (str): string that indicates what order the sensitivity is.
         title (str): title for the plot
     """
+    import matplotlib.pyplot as plt
 
     if i == '2':
         p = len(params)
@@ -133,7 +248,13 @@ def plot_index(s, params, i, title=''):
     plt.savefig(title)
 
 
-def sobol_first_total():
+def sobol_first_total(distinct_samples=8, replicates=8, max_steps=200, workers=1, checkpoint=None, seed=None,
+                      image_dir=None):
+    # SALib and matplotlib are only needed by the main process, so workers don't pay for importing them
+    import matplotlib.pyplot as plt
+    from SALib.analyze import sobol
+    from SALib.sample import saltelli
+
     # We define our variables and bounds
     problem = {
         'num_vars': 4,
@@ -141,60 +262,36 @@ def sobol_first_total():
         'bounds': [[0.01, 0.1], [0.1, 0.2], [10, 11], [0.75, 0.90]]
     }
 
-    # Set the repetitions, the amount of steps, and the amount of distinct values per variable
-    replicates = 8
-    max_steps = 200
-    distinct_samples = 8
-
     # We get all our samples here
     param_values = saltelli.sample(problem, distinct_samples, calc_second_order=False)
 
-    # Set the outputs
-    food_coords = text_to_coords("tokyo_coords.txt")
-    model_reporters = {"Graph size": lambda m: convert_result_to_graph(reduce_graph(m.get_connections(), food_coords)).size(weight="weight")}
-
-    # READ NOTE BELOW CODE
-    batch = BatchRunner(SlimeModel,
-                        max_steps=max_steps,
-                        variable_parameters={name:[] for name in problem['names']},
-                        model_reporters=model_reporters)
-
-    count = 0
-    data = pd.DataFrame(index=range(replicates*len(param_values)),
-                                    columns=['p_branch', 'p_connect', 'signal_strength', 'noise'])
-    data['Run'], data['Graph size'] = None, None
-
     start = time.time()
 
-    for i in range(replicates):
-        for vals in param_values:
-            # Transform to dict with parameter names and their values
-            variable_parameters = {}
-            for name, val in zip(problem['names'], vals):
-                variable_parameters[name] = val
-
-            batch.run_iteration(variable_parameters, tuple(vals), count)
-            iteration_data = batch.get_model_vars_dataframe().iloc[count]
-            iteration_data['Run'] = count # Don't know what causes this, but iteration number is not correctly filled
-            data.iloc[count, 0:4] = vals
-            data.iloc[count, 4:8] = iteration_data
-            count += 1
-
-            clear_output()
-            print(f'{count / (len(param_values) * (replicates)) * 100:.2f}% done')
+    output = evaluate_samples(problem['names'], param_values, replicates, max_steps, workers=workers,
+                              checkpoint=checkpoint, seed=seed, image_dir=image_dir)
 
     end = time.time()
     print("iterations / second")
-    print(len(data) / (end - start))
+    print(output.size / (end - start))
     print(end - start)
-    print(len(data))
-    
-    # Total order and first order   
-    Si_graph_size = sobol.analyze(problem, data['Graph size'].values, print_to_console=True, calc_second_order=False)
+    print(output.size)
+
+    # Total order and first order of the graph size averaged over the replicates
+    Si_graph_size = sobol.analyze(problem, output.mean(axis=0), print_to_console=True, calc_second_order=False)
     plot_index(Si_graph_size, problem['names'], 'T', 'Total order sensitivity')
     plot_index(Si_graph_size, problem['names'], '1', 'First order sensitivity')
     plt.show()
 
 
 if __name__ == "__main__":
-    sobol_first_total()
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--samples", type=int, default=8, help="amount of distinct Saltelli samples (power of 2)")
+    parser.add_argument("--replicates", type=int, default=8, help="amount of runs per sample")
+    parser.add_argument("--workers", type=int, default=1, help="amount of processes to run the simulations on")
+    parser.add_argument("--checkpoint", default=None, help="file to store intermediate results in and resume from")
+    parser.add_argument("--seed", type=int, default=None, help="seed of the experiment")
+    parser.add_argument("--images", default=None, help="directory to store an image of every network in")
+    args = parser.parse_args()
+
+    sobol_first_total(args.samples, args.replicates, workers=args.workers, checkpoint=args.checkpoint,
+                      seed=args.seed, image_dir=args.images)
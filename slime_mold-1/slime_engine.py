@@ -0,0 +1,218 @@
+from agents import SLIME
+from helpers import get_distance
+import numpy as np
+
+# Moore neighborhood offsets in the (sorted) order in which mesa returns neighborhoods, and the cost of each step
+OFFSETS = np.array([(dx, dy) for dx in (-1, 0, 1) for dy in (-1, 0, 1) if dx != 0 or dy != 0])
+COSTS = np.array([get_distance((0, 0), offset) for offset in OFFSETS])
+
+
+class ArrayEngine:
+    """
+    Array-backed alternative to stepping SlimeAgent objects.
+    The growth front is kept as NumPy index arrays and slime occupancy in the occupancy index of the model, so the
+    whole front is advanced at once every step.
+    """
+    def __init__(self, model):
+        """
+        Initialize the engine with a single slime cell at the origin of the model.
+
+        Args:
+            model: SlimeModel object that the engine advances.
+        """
+        self.model = model
+
+        # Growth front: positions of the cells that step next and the positions they were generated from
+        self.front_x = np.array([model.origin[0]])
+        self.front_y = np.array([model.origin[1]])
+        self.parent_x = self.front_x.copy()
+        self.parent_y = self.front_y.copy()
+        self.front_origin = np.array([True])
+
+    def has_slime(self, x, y):
+        """Returns a boolean array marking which of the cells at coordinate arrays x and y contain slime."""
+        return (self.model.occupancy[x, y] & SLIME) != 0
+
+    def get_neighborhoods(self):
+        """
+        Function that looks up the Moore neighborhood of every cell in the growth front.
+
+        Returns:
+            x, y: NumPy arrays of shape (front size, 8) with the coordinates of the neighbouring cells.
+            valid: boolean array of the same shape marking neighbours inside the grid, excluding the parent cell.
+        """
+        x = self.front_x[:, None] + OFFSETS[None, :, 0]
+        y = self.front_y[:, None] + OFFSETS[None, :, 1]
+
+        # Cells outside the grid and the cell a slime cell was generated from are not part of its neighborhood
+        valid = (x >= 0) & (x < self.model.width) & (y >= 0) & (y < self.model.height)
+        valid &= ~((x == self.parent_x[:, None]) & (y == self.parent_y[:, None]) & ~self.front_origin[:, None])
+
+        x = np.clip(x, 0, self.model.width - 1)
+        y = np.clip(y, 0, self.model.height - 1)
+
+        return x, y, valid
+
+    def step(self):
+        """
+        Function that advances the entire growth front one step.
+        Every front cell multiplies into the most attractive empty neighbouring cells and possibly connects to a
+        random neighbouring slime cell, after which the new cells form the growth front.
+        """
+        n = len(self.front_x)
+
+        if n == 0:
+            return
+
+        x, y, valid = self.get_neighborhoods()
+        empty = valid & ~self.has_slime(x, y)
+        n_empty = empty.sum(axis=1)
+
+        # Determine the amount of branches of every front cell
+        branch = (self.model.rng.uniform(size=n) < self.model.p_branch) & (n_empty > 1)
+        n_branches = np.where(self.front_origin, 4, np.where(branch, 2, 1))
+
+        # Apply noise to the attraction of the empty neighbouring cells
+        noise = self.model.rng.normal(0, self.model.noise, size=x.shape)
+        attraction = np.where(empty, self.model.chem_values[x, y] + noise, -np.inf)
+
+        parents, directions = self.multiply(x, y, attraction, n_branches)
+        new_x = x[parents, directions]
+        new_y = y[parents, directions]
+        connectors, connect_directions = self.connect(x, y, valid, empty, parents, new_x, new_y)
+
+        self.update_connections(parents, directions, new_x, new_y, connectors, connect_directions, x, y)
+
+        # The newly generated cells form the next growth front
+        self.parent_x = self.front_x[parents]
+        self.parent_y = self.front_y[parents]
+        self.front_x = new_x
+        self.front_y = new_y
+        self.front_origin = np.zeros(len(new_x), dtype=bool)
+
+    def multiply(self, x, y, attraction, n_branches):
+        """
+        Function that lets every front cell claim its most attractive empty neighbouring cells.
+        Claims are made in rounds: when several front cells claim the same cell, the first one in the front gets it
+        and the others claim their next best cell in the following round.
+
+        Args:
+            x, y: coordinates of the neighborhoods of the front.
+            attraction: attraction of every neighbouring cell, -inf for cells that cannot be claimed.
+            n_branches: amount of new cells every front cell generates.
+
+        Returns:
+            parents: front indices of the cells that multiplied, in front order.
+            directions: neighborhood indices of the claimed cells.
+        """
+        ranking = np.argsort(-attraction, axis=1, kind='stable')
+        attraction = np.take_along_axis(attraction, ranking, axis=1)
+        remaining = n_branches.copy()
+        all_parents = []
+        all_directions = []
+
+        while True:
+            # Every front cell claims as many of its best available cells as it still needs
+            claiming = (np.cumsum(attraction > -np.inf, axis=1) <= remaining[:, None]) & (attraction > -np.inf)
+            parents, ranks = np.nonzero(claiming)
+
+            if len(parents) == 0:
+                break
+
+            directions = ranking[parents, ranks]
+            claims = x[parents, directions] * self.model.height + y[parents, directions]
+
+            # Claims are ordered by front position, so the first claim of every cell wins
+            _, first = np.unique(claims, return_index=True)
+            won = np.zeros(len(claims), dtype=bool)
+            won[first] = True
+
+            self.model.occupancy[x[parents[won], directions[won]], y[parents[won], directions[won]]] |= SLIME
+            np.subtract.at(remaining, parents[won], 1)
+            all_parents.append(parents[won])
+            all_directions.append(directions[won])
+
+            # Cells that have been claimed can no longer be claimed by any front cell
+            attraction[self.has_slime(np.take_along_axis(x, ranking, axis=1),
+                                      np.take_along_axis(y, ranking, axis=1))] = -np.inf
+
+        parents = np.concatenate(all_parents) if all_parents else np.zeros(0, dtype=int)
+        directions = np.concatenate(all_directions) if all_directions else np.zeros(0, dtype=int)
+        order = np.argsort(parents, kind='stable')
+
+        return parents[order], directions[order]
+
+    def connect(self, x, y, valid, empty, parents, new_x, new_y):
+        """
+        Function that picks for some front cells a random neighbouring slime cell to connect to.
+        A front cell sees the slime cells present at the start of the step and the cells generated by front cells
+        before it, as if the front was stepped one cell at a time.
+
+        Args:
+            x, y: coordinates of the neighborhoods of the front.
+            valid: boolean array marking the neighbours inside the grid, excluding the parent cell.
+            empty: boolean array marking the neighbours without slime at the start of the step.
+            parents: front indices of the cells that multiplied, in front order.
+            new_x, new_y: coordinates of the new cells.
+
+        Returns:
+            connectors: front indices of the cells that connect.
+            connect_directions: neighborhood indices of the cells they connect to.
+        """
+        n = len(x)
+
+        # Find which front cell generated a neighbouring cell during this step, if any
+        new_cells = new_x * self.model.height + new_y
+        order = np.argsort(new_cells)
+        cells = x * self.model.height + y
+        index = np.minimum(np.searchsorted(new_cells[order], cells), max(len(new_cells) - 1, 0))
+        owner = np.full(cells.shape, n)
+
+        if len(new_cells) > 0:
+            is_new = new_cells[order][index] == cells
+            owner[is_new] = parents[order][index[is_new]]
+
+        occupied = valid & (~empty | (owner < np.arange(n)[:, None]))
+
+        # Connect to a random neighbouring slime cell
+        connecting = occupied.any(axis=1) & (self.model.rng.uniform(size=n) < self.model.p_connect)
+        choice = np.where(occupied, self.model.rng.uniform(size=x.shape), -1).argmax(axis=1)
+        connectors = np.flatnonzero(connecting)
+
+        return connectors, choice[connectors]
+
+    def update_connections(self, parents, directions, new_x, new_y, connectors, connect_directions, x, y):
+        """
+        Function that adds the new cells and connections of a step to the connections dictionary of the model.
+
+        Args:
+            parents: front indices of the cells that multiplied.
+            directions: neighborhood indices of the multiplications.
+            new_x, new_y: coordinates of the new cells.
+            connectors: front indices of the cells that connected.
+            connect_directions: neighborhood indices of the connections.
+            x, y: coordinates of the neighborhoods of the front.
+        """
+        connections = self.model.connections
+
+        # Columns with the x, y, x, y and cost of the new edges
+        multiplied = (self.front_x[parents], self.front_y[parents], new_x, new_y, COSTS[directions])
+        connected = (self.front_x[connectors], self.front_y[connectors], x[connectors, connect_directions],
+                     y[connectors, connect_directions], COSTS[connect_directions])
+
+        for parent_x, parent_y, child_x, child_y, cost in zip(*(column.tolist() for column in multiplied)):
+            parent = (parent_x, parent_y)
+            child = (child_x, child_y)
+
+            connections[child] = {(parent, cost)}
+            connections[parent].add((child, cost))
+
+        for front_x, front_y, other_x, other_y, cost in zip(*(column.tolist() for column in connected)):
+            node = (front_x, front_y)
+            other = (other_x, other_y)
+
+            connections[node].add((other, cost))
+            connections[other].add((node, cost))
+
+        if self.model.growth_log is not None:
+            self.model.growth_log += (multiplied, connected)
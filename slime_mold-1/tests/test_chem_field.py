@@ -0,0 +1,38 @@
+import numpy as np
+import pytest
+from chem_field import compute_chem_field
+
+
+def reference_chem_field(width, height, food_coords, signal_strength):
+    """The chemical field as FoodAgent.update_chem built it, one food source and one grid cell at a time."""
+    chem_values = np.zeros((width, height))
+
+    for position in food_coords:
+        for x in range(width):
+            for y in range(height):
+                x_y_dist = np.abs(np.subtract((x, y), position))
+                dist = np.sqrt(np.sum(x_y_dist**2))
+
+                chem_values[x, y] += signal_strength / ((dist + 1)**2)
+
+    return chem_values
+
+
+@pytest.mark.parametrize("width, height, food_coords, signal_strength", [
+    (20, 20, [(10, 10)], 1),
+    (23, 17, [(0, 0), (22, 16), (5, 11), (5, 11), (17, 3)], 10.5),
+    (12, 30, [(x, (7 * x) % 30) for x in range(12)], 0.75),
+])
+def test_matches_reference(width, height, food_coords, signal_strength):
+    expected = reference_chem_field(width, height, food_coords, signal_strength)
+
+    assert np.array_equal(compute_chem_field(width, height, food_coords, signal_strength), expected)
+
+    # Chunking over the food sources does not change the order of the sums
+    assert np.array_equal(compute_chem_field(width, height, food_coords, signal_strength, max_chunk_elements=1),
+                          expected)
+
+
+def test_without_food():
+    assert np.array_equal(compute_chem_field(5, 4, [], 1), np.zeros((5, 4)))
+
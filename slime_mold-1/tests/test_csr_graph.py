@@ -0,0 +1,167 @@
+import networkx as nx
+import numpy as np
+import pytest
+from analyze_graph import (convert_result_to_graph, estimate_average_betweenness, extract_backbone,
+                           get_average_betweenness, get_average_node_degree, get_average_shortest_path_length)
+from csr_graph import CSRGraph
+from helpers import reduce_graph
+from model import SlimeModel
+from read_geo_data import get_city_grid
+
+
+@pytest.fixture(scope="module")
+def connections():
+    """Reduced network of a simulation, with a separate component of three nodes and an isolated node."""
+    food = get_city_grid("luxembourg", 100, 100)
+    connections = reduce_graph(SlimeModel(food_coords=food, seed=1, engine="array").run(120), food)
+
+    connections[(0, 0)] = {((0, 1), 1.0), ((1, 1), 1.414)}
+    connections[(0, 1)] = {((0, 0), 1.0), ((1, 1), 1.0)}
+    connections[(1, 1)] = {((0, 0), 1.414), ((0, 1), 1.0)}
+    connections[(99, 0)] = set()
+
+    return connections
+
+
+def reference_average_shortest_path_length(graph, use_weights=True):
+    """The original metric, the mean over the connected components of the networkx average."""
+    return np.mean([nx.average_shortest_path_length(graph.subgraph(c).copy(), weight='weight' if use_weights else None)
+                    for c in nx.connected_components(graph)])
+
+
+def test_structure(connections):
+    graph = CSRGraph.from_connections(connections)
+    nx_graph = convert_result_to_graph(connections)
+
+    assert graph.n_nodes == nx_graph.number_of_nodes()
+    assert graph.n_edges == nx_graph.number_of_edges()
+    assert graph.to_connections() == connections
+    assert graph.connected_components()[0] == nx.number_connected_components(nx_graph)
+    assert np.isclose(graph.size(weight=True), nx_graph.size(weight="weight"))
+
+
+@pytest.mark.parametrize("use_weights", [True, False])
+def test_average_shortest_path_length(connections, use_weights):
+    graph = CSRGraph.from_connections(connections)
+    expected = reference_average_shortest_path_length(convert_result_to_graph(connections), use_weights)
+
+    assert np.isclose(get_average_shortest_path_length(graph, use_weights), expected)
+
+
+def test_food_path_length(connections):
+    food = get_city_grid("luxembourg", 100, 100) + [(0, 0), (1, 1), (99, 0)]
+    nx_graph = convert_result_to_graph(connections)
+    averages = []
+
+    # Mean over the components that contain food of the average length between their food sources
+    for component in nx.connected_components(nx_graph):
+        nodes = [node for node in food if node in component]
+
+        if nodes:
+            lengths = [nx.shortest_path_length(nx_graph, a, b, weight="weight")
+                       for i, a in enumerate(nodes) for b in nodes[i + 1:]]
+            averages.append(np.mean(lengths) if lengths else 0)
+
+    assert np.isclose(get_average_shortest_path_length(CSRGraph.from_connections(connections), food_nodes=food),
+                      np.mean(averages))
+
+
+def test_average_node_degree(connections):
+    graph = CSRGraph.from_connections(connections)
+    nx_graph = convert_result_to_graph(connections)
+    food = get_city_grid("luxembourg", 100, 100)
+
+    assert np.isclose(get_average_node_degree(graph), np.mean([d for _, d in nx_graph.degree()]))
+    assert np.isclose(get_average_node_degree(graph, food), np.mean([d for _, d in nx_graph.degree(food)]))
+
+
+def test_average_betweenness(connections):
+    graph = CSRGraph.from_connections(connections)
+    expected = np.mean(list(nx.betweenness_centrality(convert_result_to_graph(connections)).values()))
+
+    assert np.isclose(get_average_betweenness(graph), expected)
+
+
+def test_parallel_metrics(connections):
+    graph = CSRGraph.from_connections(connections)
+
+    assert np.isclose(get_average_shortest_path_length(graph, workers=2), get_average_shortest_path_length(graph))
+    assert np.isclose(get_average_betweenness(graph, workers=2), get_average_betweenness(graph))
+
+
+def test_sampled_betweenness(connections):
+    graph = CSRGraph.from_connections(connections)
+    exact = get_average_betweenness(graph)
+
+    # Sampling every node is exact, a sample is reproducible and its confidence interval covers the exact value
+    assert estimate_average_betweenness(graph, pivots=graph.n_nodes) == (exact, 0.0)
+    sampled = get_average_betweenness(graph, "sampled", 50, seed=3)
+    assert sampled == get_average_betweenness(graph, "sampled", 50, seed=3)
+
+    estimate, error = estimate_average_betweenness(graph, pivots=graph.n_nodes // 2, seed=3)
+    assert abs(estimate - exact) <= 2 * error
+
+    with pytest.raises(ValueError):
+        get_average_betweenness(graph, "approximate")
+
+
+def test_backbone(connections):
+    food = get_city_grid("luxembourg", 100, 100)
+    graph = CSRGraph.from_connections(connections)
+    backbone, closure = extract_backbone(graph, food)
+    nx_graph = convert_result_to_graph(connections)
+    nx_backbone = convert_result_to_graph(backbone.to_connections())
+    closure_costs = {frozenset([a, b]): cost for a, links in closure.to_connections().items() for b, cost in links}
+    n_pairs = 0
+
+    # Every edge lies on a shortest path between food sources, and the food sources keep their distances, which are
+    # the costs of the closure
+    assert set(map(tuple, backbone.nodes.tolist())) <= set(connections)
+
+    for i, a in enumerate(food):
+        for b in food[i + 1:]:
+            if a in nx_graph and b in nx_graph and nx.has_path(nx_graph, a, b):
+                length = nx.shortest_path_length(nx_graph, a, b, weight="weight")
+                n_pairs += 1
+
+                assert np.isclose(nx.shortest_path_length(nx_backbone, a, b, weight="weight"), length)
+                assert np.isclose(closure_costs[frozenset([a, b])], length)
+
+    assert len(closure_costs) == n_pairs
+
+
+def test_edge_subgraph_unsorted_neighbours():
+    graph = CSRGraph.from_edges([(0, 0), (1, 0), (2, 0), (3, 0)], [(0, 1), (1, 2), (2, 3), (0, 3)], [1, 2, 3, 4])
+    indices, weights = graph.indices.copy(), graph.weights.copy()
+
+    for i in range(graph.n_nodes):
+        neighbours = slice(graph.indptr[i], graph.indptr[i + 1])
+        indices[neighbours], weights[neighbours] = indices[neighbours][::-1], weights[neighbours][::-1]
+
+    unsorted = CSRGraph(graph.nodes, graph.indptr, indices, weights)
+
+    for subgraph in (graph.edge_subgraph([(0, 3), (2, 1)]), unsorted.edge_subgraph([(0, 3), (2, 1)])):
+        assert subgraph.to_connections() == {(0, 0): {((3, 0), 4.0)}, (1, 0): {((2, 0), 2.0)},
+                                             (2, 0): {((1, 0), 2.0)}, (3, 0): {((0, 0), 4.0)}}
+
+    with pytest.raises(ValueError):
+        unsorted.edge_subgraph([(0, 2)])
+
+
+@pytest.mark.parametrize("compress, mmap", [(False, True), (False, False), (True, True)])
+def test_save_and_load(tmp_path, connections, compress, mmap):
+    graph = CSRGraph.from_connections(connections)
+    path = str(tmp_path / "network.npz")
+    graph.save(path, compress=compress)
+    loaded = CSRGraph.load(path, mmap=mmap)
+
+    assert loaded.to_connections() == connections
+    assert all(np.array_equal(getattr(loaded, name), getattr(graph, name))
+               for name in ["nodes", "indptr", "indices", "weights"])
+
+
+def test_save_and_load_empty(tmp_path):
+    path = str(tmp_path / "network.npz")
+    CSRGraph.from_connections({}).save(path)
+
+    assert CSRGraph.load(path).to_connections() == {}
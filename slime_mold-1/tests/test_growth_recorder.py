@@ -0,0 +1,76 @@
+import copy
+import pytest
+from growth_recorder import GrowthRecording
+from model import SlimeModel
+from read_geo_data import get_city_grid
+
+
+@pytest.fixture(scope="module")
+def food():
+    return get_city_grid("rome", 100, 100)
+
+
+@pytest.mark.parametrize("engine", ["agents", "array"])
+def test_replay_matches_run(tmp_path, food, engine):
+    path = str(tmp_path / "growth.rec")
+    model = SlimeModel(food_coords=food, seed=4, engine=engine, record_file=path)
+    model.recorder.flush_interval = 7
+    snapshots = {}
+
+    for step in range(1, 61):
+        model.step()
+
+        if step in (1, 25, 60):
+            snapshots[step] = copy.deepcopy(model.connections)
+
+    model.close()
+    recording = GrowthRecording(path)
+
+    assert recording.last_step == 60
+    assert [step for step, *_ in recording.frames()] == list(range(61))
+    assert recording.metadata["food_coords"] == [list(coord) for coord in food]
+
+    for step, connections in snapshots.items():
+        replayed = recording.replay(step)
+
+        assert replayed == connections
+        assert list(replayed) == list(connections)
+
+    # Recording does not change the simulation
+    assert SlimeModel(food_coords=food, seed=4, engine=engine).run(60) == model.connections
+
+
+def test_run_completes_recording(tmp_path, food):
+    path = str(tmp_path / "growth.rec")
+    connections = SlimeModel(food_coords=food, seed=2, engine="array", record_file=path).run(80)
+
+    assert GrowthRecording(path).last_step == 80
+    assert GrowthRecording(path).replay() == connections
+
+
+def test_online_reduction_is_not_recorded(tmp_path, food):
+    path = str(tmp_path / "growth.rec")
+    SlimeModel(food_coords=food, seed=2, engine="array", online_reduction=True, record_file=path).run(80)
+
+    assert GrowthRecording(path).replay() == SlimeModel(food_coords=food, seed=2, engine="array").run(80)
+
+
+def test_truncated_recording(tmp_path, food):
+    path = str(tmp_path / "growth.rec")
+    with SlimeModel(food_coords=food, seed=2, engine="array", record_file=path) as model:
+        model.run(20)
+
+    # A block cut off by an interrupted run is ignored
+    with open(path, "ab") as fp:
+        fp.write(b"\x15\x00\x00\x00\x09")
+
+    assert GrowthRecording(path).last_step == 20
+    assert GrowthRecording(path).replay() == model.connections
+
+
+def test_not_a_recording(tmp_path):
+    path = tmp_path / "growth.rec"
+    path.write_bytes(b"not a recording")
+
+    with pytest.raises(ValueError):
+        GrowthRecording(str(path))
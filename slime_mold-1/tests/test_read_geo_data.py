@@ -0,0 +1,70 @@
+import os
+import shutil
+import numpy as np
+import pytest
+import read_geo_data
+from read_geo_data import DATA_DIR, get_city_grid, load_city, read_edges, read_nodes
+
+CITIES = sorted(os.listdir(DATA_DIR))
+
+
+def reference_city_grid(city, hor_N, ver_N):
+    """The original get_city_grid, which projected and mapped the stations one at a time."""
+    import networkx as nx
+    import utm
+
+    node_coords = read_nodes(os.path.join(DATA_DIR, city, "network_nodes.csv"))
+    graph = nx.Graph()
+    graph.add_edges_from(read_edges(os.path.join(DATA_DIR, city, "network_rail.csv")))
+
+    station_locations = {node: utm.from_latlon(*node_coords[node])[:2] for node in graph.nodes}
+    x_vals = [x for x, _ in station_locations.values()]
+    y_vals = [y for _, y in station_locations.values()]
+    grid_coords = []
+
+    for x, y in station_locations.values():
+        x_new = (x - np.min(x_vals)) / (np.max(x_vals) - np.min(x_vals))
+        y_new = (y - np.min(y_vals)) / (np.max(y_vals) - np.min(y_vals))
+        x_index = min(np.ceil(hor_N * x_new), hor_N - 1)
+        y_index = min(np.ceil(ver_N * y_new), ver_N - 1)
+        grid_coords.append((int(x_index), int(y_index)))
+
+    return grid_coords
+
+
+@pytest.mark.parametrize("city", CITIES)
+def test_matches_reference(city):
+    expected = reference_city_grid(city, 100, 80)
+
+    assert get_city_grid(city, 100, 80, merge_duplicates=False) == expected
+
+    # Merging keeps the first station in every cell
+    assert get_city_grid(city, 100, 80) == list(dict.fromkeys(expected))
+
+
+def test_cache_invalidation(tmp_path, monkeypatch):
+    city = "luxembourg"
+    shutil.copytree(os.path.join(DATA_DIR, city), tmp_path / "data" / city)
+    monkeypatch.setattr(read_geo_data, "DATA_DIR", str(tmp_path / "data"))
+    cache_dir = str(tmp_path / "cache")
+
+    built = []
+    preprocess_city = read_geo_data.preprocess_city
+    monkeypatch.setattr(read_geo_data, "preprocess_city",
+                        lambda *args: built.append(args) or preprocess_city(*args))
+
+    data = load_city(city, cache_dir)
+    assert len(built) == 1
+
+    # A second load comes from the cache
+    cached = load_city(city, cache_dir)
+    assert len(built) == 1
+    assert all(np.array_equal(data[name], cached[name]) for name in data)
+
+    # Changing a csv file rebuilds the cache
+    nodes_file = tmp_path / "data" / city / "network_nodes.csv"
+    stat = os.stat(nodes_file)
+    os.utime(nodes_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    load_city(city, cache_dir)
+    assert len(built) == 2
+    assert os.path.exists(os.path.join(cache_dir, f"{city}.npz"))
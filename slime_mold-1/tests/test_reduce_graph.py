@@ -0,0 +1,127 @@
+import copy
+import pytest
+from helpers import reduce_graph, text_to_coords
+from model import SlimeModel
+from read_geo_data import get_city_grid
+
+
+def reference_reduce_graph(graph, food_locations):
+    """The original reducer, which passes over all nodes until nothing changes."""
+    def triangular_path(node):
+        (node_1, _), (node_2, _) = graph[node]
+        coordinates_1, _ = zip(*graph[node_1])
+        coordinates_2, _ = zip(*graph[node_2])
+
+        return node_2 in coordinates_1 and node_1 in coordinates_2
+
+    reduced = False
+
+    while not reduced:
+        changed = False
+        remove_list = []
+
+        for (node_0, links) in graph.items():
+            n = len(links)
+
+            if n == 1 and node_0 not in food_locations:
+                (node_1, cost), = links
+
+                graph[node_1].remove((node_0, cost))
+                remove_list.append(node_0)
+                changed = True
+
+            elif n == 2 and node_0 not in food_locations:
+                ((node_1, cost_1), (node_2, cost_2)) = links
+                cost = round(cost_1 + cost_2, 3)
+
+                if not triangular_path(node_0):
+                    graph[node_1].add((node_2, cost))
+                    graph[node_2].add((node_1, cost))
+
+                graph[node_1].remove((node_0, cost_1))
+                graph[node_2].remove((node_0, cost_2))
+                remove_list.append(node_0)
+                changed = True
+
+        for node in remove_list:
+            del graph[node]
+
+        if not changed:
+            reduced = True
+
+    return graph
+
+
+def get_edges(graph):
+    """Returns the cost of every directed edge of a connections dictionary."""
+    return {(node, next_node): cost for node, links in graph.items() for next_node, cost in links}
+
+
+def link(graph, node_a, node_b, cost):
+    graph.setdefault(node_a, set()).add((node_b, cost))
+    graph.setdefault(node_b, set()).add((node_a, cost))
+
+
+def test_tree_matches_reference():
+    # A tree with chains and dead ends, without parallel chains the result must match exactly
+    graph = {}
+    link(graph, (0, 0), (1, 0), 1)
+    link(graph, (1, 0), (2, 0), 1)
+    link(graph, (2, 0), (3, 1), 1.414)
+    link(graph, (3, 1), (4, 1), 1)
+    link(graph, (2, 0), (2, 1), 1)
+    link(graph, (2, 1), (2, 2), 1)
+    link(graph, (2, 0), (2, -1), 1)
+    link(graph, (2, -1), (1, -2), 1.414)
+    link(graph, (1, -2), (0, -2), 1)
+    food = [(0, 0), (4, 1), (2, 2)]
+
+    expected = reference_reduce_graph(copy.deepcopy(graph), food)
+    reduced = reduce_graph(graph, food)
+
+    assert reduced == expected
+    assert list(reduced) == list(expected)
+
+
+def test_parallel_chains():
+    # Two chains between (0, 0) and (3, 0), the reducer keeps the first merged one unless keep_cheapest is given
+    graph = {}
+    link(graph, (0, 0), (1, 1), 2)
+    link(graph, (1, 1), (3, 0), 2)
+    link(graph, (0, 0), (2, 0), 1)
+    link(graph, (2, 0), (3, 0), 1)
+    link(graph, (0, 0), (-1, 0), 1)
+    link(graph, (3, 0), (4, 0), 1)
+    food = [(0, 0), (3, 0), (-1, 0), (4, 0)]
+
+    expected = reference_reduce_graph(copy.deepcopy(graph), food)
+    cheapest = reduce_graph(copy.deepcopy(graph), food, keep_cheapest=True)
+    reduced = reduce_graph(graph, food)
+
+    assert reduced == expected
+    assert get_edges(reduced)[((0, 0), (3, 0))] == 4
+    assert get_edges(cheapest)[((0, 0), (3, 0))] == 2
+
+
+@pytest.mark.parametrize("engine", ["agents", "array"])
+@pytest.mark.parametrize("seed", [0, 9])
+def test_model_networks(engine, seed):
+    food = get_city_grid("rome", 100, 100)
+    connections = SlimeModel(food_coords=food, seed=seed, engine=engine).run(120)
+
+    expected = get_edges(reference_reduce_graph(copy.deepcopy(connections), food))
+    reduced = get_edges(reduce_graph(connections, food))
+
+    assert reduced == expected
+
+
+@pytest.mark.parametrize("seed", [4, 9])
+def test_online_reduction_matches_offline(seed):
+    food = text_to_coords("tokyo_coords.txt")
+    offline = SlimeModel(food_coords=food, seed=seed, engine="array").run(200)
+    online = SlimeModel(food_coords=food, seed=seed, engine="array", online_reduction=True).run(200)
+
+    # The online reduction keeps the cheapest of parallel chains, the nodes and edges are the same either way
+    assert get_edges(reduce_graph(copy.deepcopy(online), food, keep_cheapest=True)) == \
+        get_edges(reduce_graph(copy.deepcopy(offline), food, keep_cheapest=True))
+    assert get_edges(reduce_graph(online, food)).keys() == get_edges(reduce_graph(offline, food)).keys()
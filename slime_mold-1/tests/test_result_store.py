@@ -0,0 +1,68 @@
+import os
+import numpy as np
+import pytest
+from result_store import RECORD_DTYPE, ResultStore
+
+METADATA = {"n_runs": 2, "x_vals": [0.0, 0.5, 1.0], "seed": 7}
+
+
+def append_record(store, run, index, value):
+    store.append(run=run, index=index, p_branch=0.5 * index, p_connect=0.1, signal_strength=1, noise=0.05,
+                 seed=f"{run}-{index}", path_length=value, degree=2 * value, betweenness=value / 10, duration=0.1)
+
+
+def test_append_and_read(tmp_path):
+    store = ResultStore.create(str(tmp_path / "results.bin"), METADATA)
+    assert len(store) == 0
+    assert store.completed() == set()
+
+    append_record(store, 0, 2, 3.0)
+    append_record(store, 1, 0, 5.0)
+
+    store = ResultStore(store.path)
+    records = store.records()
+
+    assert store.metadata == METADATA
+    assert len(store) == 2
+    assert records["path_length"].tolist() == [3.0, 5.0]
+    assert records["seed"].tolist() == [b"0-2", b"1-0"]
+    assert store.completed() == {(0, 2), (1, 0)}
+
+    results = store.get_results(2, 3)
+    assert results.shape == (2, 3, 3)
+    assert results[0, :, 2].tolist() == [3.0, 6.0, 0.3]
+    assert results[1, :, 0].tolist() == [5.0, 10.0, 0.5]
+    assert np.isnan(results[0, :, :2]).all() and np.isnan(results[1, :, 1:]).all()
+
+
+def test_resume_truncates_partial_record(tmp_path):
+    path = str(tmp_path / "results.bin")
+    store = ResultStore.open_or_create(path, METADATA)
+    append_record(store, 0, 0, 1.0)
+
+    # An interrupted write leaves part of a record behind
+    with open(path, "ab") as fp:
+        fp.write(b"\x01" * (RECORD_DTYPE.itemsize // 2))
+
+    store = ResultStore.open_or_create(path, METADATA)
+    assert os.path.getsize(path) == store.offset + RECORD_DTYPE.itemsize
+    assert store.completed() == {(0, 0)}
+
+    append_record(store, 0, 1, 2.0)
+    assert ResultStore(path).records()["path_length"].tolist() == [1.0, 2.0]
+
+
+def test_resume_with_other_settings(tmp_path):
+    path = str(tmp_path / "results.bin")
+    ResultStore.create(path, METADATA)
+
+    with pytest.raises(ValueError):
+        ResultStore.open_or_create(path, {**METADATA, "seed": 8})
+
+
+def test_not_a_result_file(tmp_path):
+    path = tmp_path / "results.bin"
+    path.write_bytes(b"not a result file")
+
+    with pytest.raises(ValueError):
+        ResultStore(str(path))
@@ -0,0 +1,32 @@
+import numpy as np
+import pytest
+from analyze_graph import run_experiment
+from model import SlimeModel, spawn_seeds
+from read_geo_data import get_city_grid
+
+
+@pytest.mark.parametrize("engine", ["agents", "array"])
+def test_same_seed_same_network(engine):
+    food = get_city_grid("rome", 100, 100)
+    networks = [SlimeModel(food_coords=food, seed=seed, engine=engine).run(80) for seed in (11, 11, 12)]
+
+    assert networks[0] == networks[1]
+    assert networks[0] != networks[2]
+
+
+def test_spawn_seeds():
+    seeds = spawn_seeds(7, 100)
+
+    assert len(set(seeds)) == 100
+    assert spawn_seeds(7, 100) == seeds
+    assert spawn_seeds(np.random.SeedSequence(7), 100) == seeds
+    assert not set(spawn_seeds(8, 100)) & set(seeds)
+    assert SlimeModel(seed=7).spawn_seeds(100) == seeds
+
+
+def test_experiment_independent_of_workers():
+    serial = run_experiment(seed=3, workers=1, betweenness="sampled", pivots=20, food_paths=True)
+    parallel = run_experiment(seed=3, workers=2, betweenness="sampled", pivots=20, food_paths=True)
+
+    assert np.array_equal(serial[0], parallel[0])
+    assert np.array_equal(serial[1], parallel[1])
@@ -0,0 +1,33 @@
+import numpy as np
+from sensitivity_analysis import evaluate_samples
+
+NAMES = ["p_branch"]
+PARAM_VALUES = [[0.05], [0.08]]
+MAX_STEPS = 40
+
+
+def test_checkpoint_resume_without_seed(tmp_path):
+    checkpoint = str(tmp_path / "checkpoint.npz")
+    output = evaluate_samples(NAMES, PARAM_VALUES, 1, MAX_STEPS, checkpoint=checkpoint)
+
+    # The random 128-bit seed is stored in a form that loads without pickle
+    with np.load(checkpoint) as data:
+        seed = int(data["seed"].item())
+        assert data["output"].tolist() == output.ravel().tolist()
+
+    assert seed.bit_length() > 64
+
+    # A finished checkpoint is resumed without running anything
+    assert evaluate_samples(NAMES, PARAM_VALUES, 1, MAX_STEPS, checkpoint=checkpoint).tolist() == output.tolist()
+
+    # Forget the second run as if the experiment was interrupted, resuming runs it again with the stored seed
+    with np.load(checkpoint) as data:
+        param_values, partial = data["param_values"], data["output"].copy()
+
+    partial[1] = np.nan
+    np.savez(checkpoint, param_values=param_values, output=partial, seed=str(seed))
+
+    resumed = evaluate_samples(NAMES, PARAM_VALUES, 1, MAX_STEPS, checkpoint=checkpoint)
+    assert resumed.tolist() == output.tolist()
+    assert np.all(output > 0)
+    assert resumed.tolist() == evaluate_samples(NAMES, PARAM_VALUES, 1, MAX_STEPS, seed=seed).tolist()
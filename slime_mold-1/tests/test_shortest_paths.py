@@ -0,0 +1,58 @@
+import networkx as nx
+import numpy as np
+import pytest
+from analyze_graph import convert_result_to_graph, get_all_shortest_paths
+from helpers import reduce_graph
+from model import SlimeModel
+from read_geo_data import get_city_grid
+
+
+@pytest.fixture(scope="module")
+def network():
+    """Reduced network of a simulation with a separate component of two food sources, so some pairs have no path."""
+    food = get_city_grid("rome", 100, 100)
+    connections = reduce_graph(SlimeModel(food_coords=food, seed=3, engine="array").run(120), food)
+
+    connections[(0, 0)] = {((0, 1), 1.0)}
+    connections[(0, 1)] = {((0, 0), 1.0)}
+
+    return connections, [node for node in food if node in connections] + [(0, 0), (0, 1)]
+
+
+def get_cost(connections, path):
+    """Returns the total cost of the edges of a path."""
+    return sum(dict(connections[node_a])[node_b] for node_a, node_b in zip(path, path[1:]))
+
+
+@pytest.mark.parametrize("method", ["dijkstra", "astar"])
+def test_matches_networkx(network, method):
+    connections, food = network
+    graph = convert_result_to_graph(connections)
+    paths = get_all_shortest_paths(connections, food, method)
+
+    assert len(paths) == len(food) * (len(food) - 1) // 2
+
+    for i, node_a in enumerate(food):
+        lengths = nx.single_source_dijkstra_path_length(graph, node_a, weight="weight")
+
+        for node_b in food[i + 1:]:
+            path = paths[frozenset([node_a, node_b])]
+
+            # Unreachable pairs have no path, the others connect the pair with the shortest length
+            if node_b not in lengths:
+                assert path is None
+            else:
+                assert {path[0], path[-1]} == {node_a, node_b}
+                assert np.isclose(get_cost(connections, path), lengths[node_b])
+
+
+@pytest.mark.parametrize("method", ["dijkstra", "astar"])
+def test_lengths_only(network, method):
+    connections, food = network
+    paths = get_all_shortest_paths(connections, food, method)
+    lengths = get_all_shortest_paths(connections, food, method, return_paths=False)
+
+    assert lengths.keys() == paths.keys()
+    assert lengths[frozenset([(0, 0), food[0]])] is None
+    assert all((lengths[key] is None) == (path is None) for key, path in paths.items())
+    assert all(np.isclose(lengths[key], get_cost(connections, path)) for key, path in paths.items() if path)
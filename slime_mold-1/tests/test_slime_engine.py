@@ -0,0 +1,45 @@
+import numpy as np
+from agents import SLIME
+from model import SlimeModel
+from read_geo_data import get_city_grid
+from slime_engine import COSTS, OFFSETS
+
+
+def test_array_engine_invariants():
+    model = SlimeModel(food_coords=get_city_grid("rome", 100, 100), seed=5, engine="array")
+    engine = model.engine
+    update_connections = engine.update_connections
+    n_new = []
+
+    def check_update(parents, directions, new_x, new_y, *args):
+        """Checks the cells that were claimed in a step before they are added to the connections."""
+        new_cells = list(zip(new_x.tolist(), new_y.tolist()))
+        n_new.append(len(new_cells))
+
+        # Every new cell is a Moore neighbour of the front cell it grew from, and no cell is claimed twice
+        assert np.array_equal(new_x - engine.front_x[parents], OFFSETS[directions, 0])
+        assert np.array_equal(new_y - engine.front_y[parents], OFFSETS[directions, 1])
+        assert len(set(new_cells)) == len(new_cells)
+        assert not set(new_cells) & model.connections.keys()
+        assert np.all(np.bincount(parents, minlength=len(engine.front_x)) <= np.where(engine.front_origin, 4, 2))
+
+        update_connections(parents, directions, new_x, new_y, *args)
+
+    engine.update_connections = check_update
+
+    for _ in range(120):
+        model.step()
+
+        # The occupancy index holds slime on exactly the cells of the network
+        x, y = np.nonzero(model.occupancy & SLIME)
+        assert set(zip(x.tolist(), y.tolist())) == model.connections.keys()
+
+    assert sum(n_new) == len(model.connections) - 1
+
+    # Connections are symmetric and cost the length of the step between two neighbouring cells
+    costs = {tuple(offset): cost for offset, cost in zip(OFFSETS.tolist(), COSTS.tolist())}
+
+    for (x_a, y_a), links in model.connections.items():
+        for (x_b, y_b), cost in links:
+            assert cost == costs[(x_b - x_a, y_b - y_a)]
+            assert ((x_a, y_a), cost) in model.connections[(x_b, y_b)]